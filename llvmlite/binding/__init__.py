@@ -15,4 +15,5 @@ from .analysis import *
 from .object_file import *
 from .context import *
 from .orcjit import *
+from .compiler import *
 from .config import *
@@ -0,0 +1,126 @@
+"""
+asyncio wrappers for the long-running compilation steps.
+
+The work runs on a shared pool of worker threads.  ctypes releases the
+GIL while LLVM runs, and modules of distinct contexts are protected by
+distinct locks, so that coroutines compiling in separate contexts make
+progress concurrently.  The number of jobs in flight from an event loop
+is bounded by the number of workers: once it is reached, the coroutines
+wait before submitting more work, rather than queuing it without limit.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from llvmlite.binding.module import parse_assembly, parse_bitcode
+
+
+_pool_lock = threading.Lock()
+_executor = None
+_max_workers = None
+# The semaphore bounding the jobs submitted from each event loop
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_max_workers():
+    """
+    Return the number of worker threads, which is also the maximum
+    number of jobs in flight from an event loop.
+    """
+    return _max_workers or os.cpu_count() or 1
+
+
+def set_max_workers(count):
+    """
+    Set the number of worker threads.  The current pool, if any, is shut
+    down once its pending jobs are done.  *count* may be None to use the
+    number of CPUs.
+    """
+    global _executor, _max_workers
+    if count is not None and count < 1:
+        raise ValueError("max_workers must be at least 1, got %r" % (count,))
+    with _pool_lock:
+        executor = _executor
+        _executor = None
+        _max_workers = count
+        _semaphores.clear()
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def shutdown(wait=True):
+    """
+    Shut the worker pool down.  A new one is created by the next
+    coroutine submitting work.
+    """
+    global _executor
+    with _pool_lock:
+        executor = _executor
+        _executor = None
+        _semaphores.clear()
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _get_executor():
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_max_workers(),
+                thread_name_prefix='llvmlite-aio')
+        return _executor
+
+
+def _get_semaphore(loop):
+    with _pool_lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(get_max_workers())
+            _semaphores[loop] = semaphore
+        return semaphore
+
+
+def _release(loop, semaphore, future):
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # The event loop is closed
+        pass
+
+
+async def run(func, *args, **kwargs):
+    """
+    Call ``func(*args, **kwargs)`` on the worker pool and return its
+    result.  This waits first if too many jobs are in flight.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _get_semaphore(loop)
+    await semaphore.acquire()
+    try:
+        future = _get_executor().submit(func, *args, **kwargs)
+    except BaseException:
+        semaphore.release()
+        raise
+    # The slot is only released once the job is done, even if the
+    # awaiting coroutine is cancelled while the job is running
+    future.add_done_callback(partial(_release, loop, semaphore))
+    return await asyncio.wrap_future(future)
+
+
+async def aparse_assembly(llvmir, context=None):
+    """
+    Coroutine version of :func:`llvmlite.binding.parse_assembly`.
+    """
+    return await run(parse_assembly, llvmir, context)
+
+
+async def aparse_bitcode(bitcode, context=None):
+    """
+    Coroutine version of :func:`llvmlite.binding.parse_bitcode`.
+    """
+    return await run(parse_bitcode, bitcode, context)
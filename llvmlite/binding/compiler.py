@@ -0,0 +1,110 @@
+import concurrent.futures
+import multiprocessing
+import os
+from collections import namedtuple
+
+from llvmlite.binding.initfini import (initialize_all_targets,
+                                       initialize_all_asmprinters)
+from llvmlite.binding.context import create_context
+from llvmlite.binding.module import parse_assembly
+from llvmlite.binding.newpassmanagers import (create_pass_builder,
+                                              create_pipeline_tuning_options)
+from llvmlite.binding.targets import Target
+
+
+class TargetMachineSpec(namedtuple('TargetMachineSpec',
+                                   ['triple', 'cpu', 'features', 'reloc',
+                                    'codemodel', 'abiname'],
+                                   defaults=(None, '', '', 'default',
+                                             'jitdefault', ''))):
+    """
+    A picklable description of a TargetMachine, for creating it in another
+    process.  A None *triple* stands for the default triple of the host.
+    """
+    __slots__ = ()
+
+    def create_target_machine(self, opt=2):
+        if self.triple is None:
+            target = Target.from_default_triple()
+        else:
+            target = Target.from_triple(self.triple)
+        return target.create_target_machine(cpu=self.cpu,
+                                            features=self.features,
+                                            opt=opt,
+                                            reloc=self.reloc,
+                                            codemodel=self.codemodel,
+                                            abiname=self.abiname)
+
+
+def compile_many(ir_texts, target_machine_spec=None, opt_level=2,
+                 workers=None):
+    """
+    Optimize and compile each of the LLVM IR strings *ir_texts* to object
+    code, returning a list of byte strings in the same order, e.g. for
+    JITLibraryBuilder.add_object_img().
+
+    The modules are compiled by *workers* processes (the number of CPUs
+    by default), each creating its own TargetMachine from
+    *target_machine_spec*, a TargetMachineSpec.  They run the default
+    optimization pipeline of *opt_level* followed by code generation.
+    Each module is parsed in a fresh context, so that the object code
+    doesn't depend on the modules compiled before it by the same worker.
+    """
+    ir_texts = list(ir_texts)
+    if not ir_texts:
+        return []
+    if target_machine_spec is None:
+        target_machine_spec = TargetMachineSpec()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(ir_texts))
+    if workers <= 1:
+        compiler = _Compiler(target_machine_spec, opt_level)
+        return [compiler.compile(llvmir) for llvmir in ir_texts]
+    # Several chunks per worker to balance the load, while amortizing the
+    # cost of sending the IR over
+    chunksize = max(1, len(ir_texts) // (workers * 4))
+    # LLVM's state and locks aren't safe to fork(), start the workers afresh
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker, initargs=(target_machine_spec, opt_level))
+    with pool:
+        return list(pool.map(_compile_in_worker, ir_texts,
+                             chunksize=chunksize))
+
+
+class _Compiler:
+
+    def __init__(self, target_machine_spec, opt_level):
+        initialize_all_targets()
+        initialize_all_asmprinters()
+        self.tm = target_machine_spec.create_target_machine(opt=opt_level)
+        self.triple = self.tm.triple
+        self.data_layout = str(self.tm.target_data)
+        pto = create_pipeline_tuning_options(opt_level)
+        self.pb = create_pass_builder(self.tm, pto)
+        self.mpm = self.pb.getModulePassManager()
+
+    def compile(self, llvmir):
+        mod = parse_assembly(llvmir, create_context())
+        if not mod.triple:
+            mod.triple = self.triple
+        if not mod.data_layout:
+            mod.data_layout = self.data_layout
+        mod.verify()
+        self.mpm.run(mod, self.pb)
+        return self.tm.emit_object(mod)
+
+
+# The compiler of a compile_many() worker process
+_worker_compiler = None
+
+
+def _init_worker(target_machine_spec, opt_level):
+    global _worker_compiler
+    _worker_compiler = _Compiler(target_machine_spec, opt_level)
+
+
+def _compile_in_worker(llvmir):
+    return _worker_compiler.compile(llvmir)
@@ -14,12 +14,24 @@ def get_global_context():
 class ContextRef(ffi.ObjectRef):
     def __init__(self, context_ptr):
         super(ContextRef, self).__init__(context_ptr)
+        # Calls on the objects of distinct contexts can run concurrently
+        self._lock = ffi._new_context_lock()
+
+    @property
+    def _context(self):
+        return self
 
     def _dispose(self):
         ffi.lib.LLVMPY_ContextDispose(self)
 
 
 class GlobalContextRef(ContextRef):
+    def __init__(self, context_ptr):
+        ffi.ObjectRef.__init__(self, context_ptr)
+        # The global context is shared with all the code using LLVM
+        # without an explicit context, so it uses the global lock
+        self._lock = ffi.lib._lock
+
     def _dispose(self):
         pass
 
@@ -59,6 +59,7 @@ class ExecutionEngine(ffi.ObjectRef):
         """
         self._modules = set([module])
         self._td = None
+        self._context = module._context
         module._owned = True
         ffi.ObjectRef.__init__(self, ptr)
 
@@ -1,5 +1,6 @@
 import sys
 import ctypes
+import itertools
 import threading
 import importlib.resources as _impres
 
@@ -54,13 +55,18 @@ class _LLVMLock:
     the lock as a context manager.
 
     Also, callbacks can be attached so that every time the lock is acquired
-    and released the corresponding callbacks will be invoked.
+    and released the corresponding callbacks will be invoked.  Locks
+    created with the same *cblist* share their callbacks.
     """
-    def __init__(self):
+    # Creation order of the locks, the order in which _LockGroup takes them
+    _ranks = itertools.count()
+
+    def __init__(self, cblist=None):
         # The reentrant lock is needed for callbacks that re-enter
         # the Python interpreter.
         self._lock = threading.RLock()
-        self._cblist = []
+        self._cblist = [] if cblist is None else cblist
+        self._rank = next(self._ranks)
 
     def register(self, acq_fn, rel_fn):
         """Register callbacks that are invoked immediately after the lock is
@@ -87,6 +93,38 @@ class _LLVMLock:
         self._lock.release()
 
 
+class _LockGroup:
+    """Several _LLVMLock acquired together, for a call on objects which
+    aren't protected by the same lock.
+
+    The context locks are taken in their creation order, followed by the
+    global lock *default* if it is one of *locks*, so that two threads
+    taking overlapping groups can't deadlock.  The callbacks, which are
+    shared by all the locks, are invoked once.
+    """
+    __slots__ = ['_locks', '_cblist']
+
+    def __init__(self, locks, default):
+        has_default = default in locks
+        locks.discard(default)
+        self._locks = sorted(locks, key=lambda lock: lock._rank)
+        if has_default:
+            self._locks.append(default)
+        self._cblist = default._cblist
+
+    def __enter__(self):
+        for lock in self._locks:
+            lock._lock.acquire()
+        for acq_fn, rel_fn in self._cblist:
+            acq_fn()
+
+    def __exit__(self, *exc_details):
+        for acq_fn, rel_fn in self._cblist:
+            rel_fn()
+        for lock in reversed(self._locks):
+            lock._lock.release()
+
+
 class _suppress_cleanup_errors:
     def __init__(self, context):
         self._context = context
@@ -182,14 +220,19 @@ class _lib_fn_wrapper(object):
     """Wraps and duck-types a ctypes.CFUNCTYPE to provide
     automatic locking when the wrapped function is called.
 
-    TODO: we can add methods to mark the function as threadsafe
-          and remove the locking-step on call when marked.
+    The lock taken is chosen from the arguments by _select_lock().
+    Functions which are safe to call concurrently can be marked by
+    setting their ``threadsafe`` attribute, and are then called without
+    taking any lock.  In all cases, ctypes releases the GIL for the
+    duration of the call, so that long-running functions only block the
+    threads waiting for the same lock.
     """
-    __slots__ = ['_lock', '_cfn']
+    __slots__ = ['_lock', '_cfn', '_threadsafe']
 
     def __init__(self, lock, cfn):
         self._lock = lock
         self._cfn = cfn
+        self._threadsafe = False
 
     @property
     def argtypes(self):
@@ -207,9 +250,90 @@ class _lib_fn_wrapper(object):
     def restype(self, restype):
         self._cfn.restype = restype
 
+    @property
+    def threadsafe(self):
+        """Whether the function is called without taking the lock.
+
+        Only functions which don't touch any state shared between
+        threads, such as freeing a string or reading a memory buffer
+        owned by the caller, may be marked.  Queries on modules, values
+        and types may not, since another thread can be modifying the
+        objects they read.  The lock callbacks are not invoked for the
+        marked functions.
+        """
+        return self._threadsafe
+
+    @threadsafe.setter
+    def threadsafe(self, threadsafe):
+        self._threadsafe = threadsafe
+
     def __call__(self, *args, **kwargs):
-        with self._lock:
+        if self._threadsafe:
             return self._cfn(*args, **kwargs)
+        try:
+            with _select_lock(args, self._lock):
+                return self._cfn(*args, **kwargs)
+        finally:
+            if _pending_disposals:
+                _dispose_pending()
+
+
+def _select_lock(args, default):
+    """Return the lock protecting a call on *args*, *default* being the
+    global lock.
+
+    If all the ObjectRef arguments belong to the same LLVM context, this
+    is the lock of that context.  Objects which don't belong to any
+    context, such as target machines, pass builders or target data, may
+    be shared by threads using distinct contexts, so they are protected
+    by the global lock.  A call on objects protected by different locks
+    takes all of them.
+    """
+    lock = None
+    locks = None
+    for arg in args:
+        if isinstance(arg, ObjectRef):
+            context = arg._context
+            arg_lock = default if context is None else context._lock
+            if lock is None:
+                lock = arg_lock
+            elif arg_lock is not lock:
+                if locks is None:
+                    locks = {lock}
+                locks.add(arg_lock)
+    if locks is not None:
+        return _LockGroup(locks, default)
+    return default if lock is None else lock
+
+
+# The objects whose disposal was deferred by ObjectRef.__del__()
+_pending_disposals = []
+
+
+def _try_dispose(obj):
+    """Close *obj* if the lock protecting it can be taken right away, and
+    return whether it was closed.
+    """
+    lock = _select_lock((obj,), lib._lock)
+    if not lock._lock.acquire(blocking=False):
+        return False
+    try:
+        obj.close()
+    finally:
+        lock._lock.release()
+    return True
+
+
+def _dispose_pending():
+    while _pending_disposals:
+        try:
+            obj = _pending_disposals.pop()
+        except IndexError:
+            # Another thread took the last one
+            break
+        if not _try_dispose(obj):
+            _pending_disposals.append(obj)
+            break
 
 
 def _importlib_resources_path_repl(package, resource):
@@ -248,6 +372,13 @@ def unregister_lock_callback(acq_fn, rel_fn):
     lib._lock.unregister(acq_fn, rel_fn)
 
 
+def _new_context_lock():
+    """Create the lock of a LLVM context other than the global one.  The
+    callbacks registered for the global lock are invoked by this lock too.
+    """
+    return _LLVMLock(lib._lock._cblist)
+
+
 class _DeadPointer(object):
     """
     Dummy class to make error messages more helpful.
@@ -330,6 +461,10 @@ def ret_bytes(ptr):
         return OutputString.from_return(ptr).bytes
 
 
+# Freeing the strings returned by the C API doesn't need any lock
+lib.LLVMPY_DisposeString.threadsafe = True
+
+
 class ObjectRef(object):
     """
     A wrapper around a ctypes pointer to a LLVM object ("resource").
@@ -338,6 +473,11 @@ class ObjectRef(object):
     _as_parameter_ = _DeadPointer()
     # Whether this object pointer is owned by another one.
     _owned = False
+    # The owner of the LLVM context this object belongs to, if any: a
+    # ContextRef, or a LLJIT which manages its own contexts.  Its lock is
+    # taken when calling the C API on the object.  The objects which don't
+    # belong to a context are protected by the global lock.
+    _context = None
 
     def __init__(self, ptr):
         if ptr is None:
@@ -392,7 +532,17 @@ class ObjectRef(object):
     def __del__(self, _is_shutting_down=_is_shutting_down):
         if not _is_shutting_down():
             if self.close is not None:
-                self.close()
+                if (self._closed or self._owned
+                        or type(self)._dispose is ObjectRef._dispose):
+                    # Nothing to dispose of
+                    self.detach()
+                elif not _try_dispose(self):
+                    # The finalizer may run while this thread holds
+                    # another lock, e.g. from a lock callback.  Waiting
+                    # for this object's lock could deadlock with a thread
+                    # doing the same the other way round, so the object
+                    # is disposed of after the next call into LLVM.
+                    _pending_disposals.append(self)
 
     def __bool__(self):
         return bool(self._ptr)
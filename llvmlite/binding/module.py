@@ -104,7 +104,7 @@ class ModuleRef(ffi.ObjectRef):
         p = ffi.lib.LLVMPY_GetNamedStructType(self, _encode_string(name))
         if not p:
             raise NameError(name)
-        return TypeRef(p)
+        return TypeRef(p, self._context)
 
     def verify(self):
         """
@@ -215,6 +215,9 @@ class _Iterator(ffi.ObjectRef):
     def __init__(self, ptr, parents):
         ffi.ObjectRef.__init__(self, ptr)
         self._parents = parents
+        for parent in parents.values():
+            self._context = parent._context
+            break
         assert self.kind is not None
 
     def __next__(self):
@@ -262,7 +265,7 @@ class _TypesIterator(_Iterator):
     def __next__(self):
         vp = self._next()
         if vp:
-            return TypeRef(vp)
+            return TypeRef(vp, self._context)
         else:
             raise StopIteration
 
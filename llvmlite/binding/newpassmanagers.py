@@ -1,7 +1,7 @@
 from ctypes import c_bool, c_int, c_size_t, POINTER, Structure, byref, c_char_p
 from collections import namedtuple
 from enum import IntFlag
-from llvmlite.binding import ffi
+from llvmlite.binding import ffi, aio
 
 
 def create_new_module_pass_manager():
@@ -123,6 +123,13 @@ class NewPassManager():
         else:
             ffi.lib.LLVMPY_RunNewFunctionPassManager(self, IR, pb)
 
+    async def arun(self, IR, pb):
+        """
+        Coroutine version of run(), running the passes on a worker
+        thread of :mod:`llvmlite.binding.aio`.
+        """
+        await aio.run(self.run, IR, pb)
+
     def add_aa_eval_pass(self):
         if isinstance(self, ModulePassManager):
             ffi.lib.LLVMPY_module_AddAAEvaluator(self)
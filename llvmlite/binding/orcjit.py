@@ -1,7 +1,7 @@
 import ctypes
 from ctypes import POINTER, c_bool, c_char_p, c_uint8, c_uint64, c_size_t
 
-from llvmlite.binding import ffi, targets
+from llvmlite.binding import ffi, targets, aio
 
 
 class _LinkElement(ctypes.Structure):
@@ -162,7 +162,7 @@ class JITLibraryBuilder:
 
         with ffi.OutputString() as outerr:
             tracker = lljit._capi.LLVMPY_LLJIT_Link(
-                lljit._ptr,
+                lljit,
                 encoded_library_name,
                 elements,
                 len(self.__entries),
@@ -176,7 +176,15 @@ class JITLibraryBuilder:
         return ResourceTracker(tracker,
                                library_name,
                                {name: exports[idx].address
-                                for idx, name in enumerate(self.__exports)})
+                                for idx, name in enumerate(self.__exports)},
+                               lljit)
+
+    async def alink(self, lljit, library_name):
+        """
+        Coroutine version of link(), linking the library on a worker thread
+        of :mod:`llvmlite.binding.aio`.
+        """
+        return await aio.run(self.link, lljit, library_name)
 
 
 class ResourceTracker(ffi.ObjectRef):
@@ -196,9 +204,11 @@ class ResourceTracker(ffi.ObjectRef):
     LLVM internally tracks references between different libraries, so only
     "leaf" libraries need to be tracked.
     """
-    def __init__(self, ptr, name, addresses):
+    def __init__(self, ptr, name, addresses, lljit=None):
         self.__addresses = addresses
         self.__name = name
+        if lljit is not None:
+            self._context = lljit._context
         ffi.ObjectRef.__init__(self, ptr)
 
     def __getitem__(self, item):
@@ -231,8 +241,16 @@ class LLJIT(ffi.ObjectRef):
     """
     def __init__(self, ptr):
         self._td = None
+        # The JIT parses and compiles its libraries in LLVM contexts of
+        # its own, so that linking a library only takes the JIT's lock
+        # and doesn't block the threads using other contexts
+        self._lock = ffi._new_context_lock()
         ffi.ObjectRef.__init__(self, ptr)
 
+    @property
+    def _context(self):
+        return self
+
     def lookup(self, dylib, fn):
         """
         Find a function in this dynamic library and construct a new tracking
@@ -258,7 +276,7 @@ class LLJIT(ffi.ObjectRef):
             if not tracker:
                 raise RuntimeError(str(outerr))
 
-        return ResourceTracker(tracker, dylib, {fn: address.value})
+        return ResourceTracker(tracker, dylib, {fn: address.value}, self)
 
     @property
     def target_data(self):
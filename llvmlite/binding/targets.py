@@ -2,7 +2,7 @@ import os
 from ctypes import (POINTER, c_char_p, c_longlong, c_int, c_size_t,
                     c_void_p, string_at)
 
-from llvmlite.binding import ffi
+from llvmlite.binding import ffi, aio
 from llvmlite.binding.initfini import llvm_version_info
 from llvmlite.binding.common import _decode_string, _encode_string
 from collections import namedtuple
@@ -319,6 +319,20 @@ class TargetMachine(ffi.ObjectRef):
         """
         return _decode_string(self._emit_to_memory(module, use_object=False))
 
+    async def aemit_object(self, module):
+        """
+        Coroutine version of emit_object(), emitting the code on a
+        worker thread of :mod:`llvmlite.binding.aio`.
+        """
+        return await aio.run(self.emit_object, module)
+
+    async def aemit_assembly(self, module):
+        """
+        Coroutine version of emit_assembly(), emitting the code on a
+        worker thread of :mod:`llvmlite.binding.aio`.
+        """
+        return await aio.run(self.emit_assembly, module)
+
     def _emit_to_memory(self, module, use_object=False):
         """Returns bytes of object code of the module.
 
@@ -450,11 +464,14 @@ ffi.lib.LLVMPY_TargetMachineEmitToMemory.restype = ffi.LLVMMemoryBufferRef
 
 ffi.lib.LLVMPY_GetBufferStart.argtypes = [ffi.LLVMMemoryBufferRef]
 ffi.lib.LLVMPY_GetBufferStart.restype = c_void_p
+ffi.lib.LLVMPY_GetBufferStart.threadsafe = True
 
 ffi.lib.LLVMPY_GetBufferSize.argtypes = [ffi.LLVMMemoryBufferRef]
 ffi.lib.LLVMPY_GetBufferSize.restype = c_size_t
+ffi.lib.LLVMPY_GetBufferSize.threadsafe = True
 
 ffi.lib.LLVMPY_DisposeMemoryBuffer.argtypes = [ffi.LLVMMemoryBufferRef]
+ffi.lib.LLVMPY_DisposeMemoryBuffer.threadsafe = True
 
 ffi.lib.LLVMPY_CreateTargetMachineData.argtypes = [
     ffi.LLVMTargetMachineRef,
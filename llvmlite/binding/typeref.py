@@ -48,6 +48,11 @@ _TypeKindToIRType = {
 class TypeRef(ffi.ObjectRef):
     """A weak reference to a LLVM type
     """
+    def __init__(self, ptr, context=None):
+        ffi.ObjectRef.__init__(self, ptr)
+        # The context owning the type, whose lock protects calls on it
+        self._context = context
+
     @property
     def name(self):
         """
@@ -107,7 +112,8 @@ class TypeRef(ffi.ObjectRef):
         """
         if self.is_pointer:
             raise ValueError("Type {} doesn't contain elements.".format(self))
-        return _TypeListIterator(ffi.lib.LLVMPY_ElementIter(self))
+        return _TypeListIterator(ffi.lib.LLVMPY_ElementIter(self),
+                                 self._context)
 
     @property
     def element_count(self):
@@ -161,12 +167,12 @@ class TypeRef(ffi.ObjectRef):
         if nparams > 0:
             out_buffer = (ffi.LLVMTypeRef * nparams)(None)
             ffi.lib.LLVMPY_GetParamTypes(self, out_buffer)
-            return tuple(map(TypeRef, out_buffer))
+            return tuple(TypeRef(ptr, self._context) for ptr in out_buffer)
         else:
             return ()
 
     def get_function_return(self) -> "TypeRef":
-        return TypeRef(ffi.lib.LLVMPY_GetReturnType(self))
+        return TypeRef(ffi.lib.LLVMPY_GetReturnType(self), self._context)
 
     def as_ir(self, ir_ctx: ir.Context) -> ir.Type:
         """Convert into a ``llvmlite.ir.Type``.
@@ -185,10 +191,14 @@ class TypeRef(ffi.ObjectRef):
 
 class _TypeIterator(ffi.ObjectRef):
 
+    def __init__(self, ptr, context):
+        ffi.ObjectRef.__init__(self, ptr)
+        self._context = context
+
     def __next__(self):
         vp = self._next()
         if vp:
-            return TypeRef(vp)
+            return TypeRef(vp, self._context)
         else:
             raise StopIteration
 
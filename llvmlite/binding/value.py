@@ -87,6 +87,9 @@ class ValueRef(ffi.ObjectRef):
     def __init__(self, ptr, kind, parents):
         self._kind = kind
         self._parents = parents
+        for parent in parents.values():
+            self._context = parent._context
+            break
         ffi.ObjectRef.__init__(self, ptr)
 
     def __str__(self):
@@ -215,7 +218,7 @@ class ValueRef(ffi.ObjectRef):
         This value's LLVM type.
         """
         # XXX what does this return?
-        return TypeRef(ffi.lib.LLVMPY_TypeOf(self))
+        return TypeRef(ffi.lib.LLVMPY_TypeOf(self), self._context)
 
     @property
     def global_value_type(self):
@@ -226,7 +229,8 @@ class ValueRef(ffi.ObjectRef):
         See https://llvm.org/docs/OpaquePointers.html#migration-instructions
         """
         assert self.is_global or self.is_function
-        return TypeRef(ffi.lib.LLVMPY_GlobalGetValueType(self))
+        return TypeRef(ffi.lib.LLVMPY_GlobalGetValueType(self),
+                       self._context)
 
     @property
     def is_declaration(self):
@@ -248,20 +252,20 @@ class ValueRef(ffi.ObjectRef):
         itr = iter(())
         if self.is_function:
             it = ffi.lib.LLVMPY_FunctionAttributesIter(self)
-            itr = _AttributeListIterator(it)
+            itr = _AttributeListIterator(it, self._context)
         elif self.is_instruction:
             if self.opcode == 'call':
                 it = ffi.lib.LLVMPY_CallInstAttributesIter(self)
-                itr = _AttributeListIterator(it)
+                itr = _AttributeListIterator(it, self._context)
             elif self.opcode == 'invoke':
                 it = ffi.lib.LLVMPY_InvokeInstAttributesIter(self)
-                itr = _AttributeListIterator(it)
+                itr = _AttributeListIterator(it, self._context)
         elif self.is_global:
             it = ffi.lib.LLVMPY_GlobalAttributesIter(self)
-            itr = _AttributeSetIterator(it)
+            itr = _AttributeSetIterator(it, self._context)
         elif self.is_argument:
             it = ffi.lib.LLVMPY_ArgumentAttributesIter(self)
-            itr = _AttributeSetIterator(it)
+            itr = _AttributeSetIterator(it, self._context)
         return itr
 
     @property
@@ -393,6 +397,9 @@ class _ValueIterator(ffi.ObjectRef):
         ffi.ObjectRef.__init__(self, ptr)
         # Keep parent objects (module, function, etc) alive
         self._parents = parents
+        for parent in parents.values():
+            self._context = parent._context
+            break
         if self.kind is None:
             raise NotImplementedError('%s must specify kind attribute'
                                       % (type(self).__name__,))
@@ -412,6 +419,10 @@ class _ValueIterator(ffi.ObjectRef):
 
 class _AttributeIterator(ffi.ObjectRef):
 
+    def __init__(self, ptr, context):
+        ffi.ObjectRef.__init__(self, ptr)
+        self._context = context
+
     def __next__(self):
         vp = self._next()
         if vp:
@@ -1,4 +1,4 @@
-from collections import defaultdict
+import itertools
 
 
 class DuplicatedNameError(NameError):
@@ -6,34 +6,103 @@ class DuplicatedNameError(NameError):
 
 
 class NameScope(object):
-    def __init__(self):
+    """
+    A set of unique names.
+
+    When a name is already in use, deduplicate() appends a counter kept
+    per base name, so that a single lookup is needed.
+
+    In lazy mode, anonymous values are only numbered when a name is first
+    needed, see defer().  The numbered names (".1", ".2"...) are then not
+    stored in the set: all those up to the current counter are considered
+    used.
+    """
+
+    def __init__(self, lazy=False, order=None):
+        self.lazy = lazy
+        # A callable returning the values of the scope in the order
+        # anonymous values should be numbered (e.g. their textual order)
+        self._order = order
         self._useset = set([''])
-        self._basenamemap = defaultdict(int)
+        self._basenamemap = {}
+        # Anonymous values waiting for a name, in creation order
+        self._deferred = []
 
     def is_used(self, name):
-        return name in self._useset
+        return name in self._useset or self._is_numbered(name)
+
+    def _is_numbered(self, name):
+        # Whether *name* may have been given to an anonymous value in
+        # lazy mode
+        if not self.lazy or name[:1] != '.':
+            return False
+        ident = name[1:]
+        return (ident.isdecimal() and
+                int(ident) <= self._basenamemap.get('', 0))
 
     def register(self, name, deduplicate=False):
-        if deduplicate:
-            name = self.deduplicate(name)
-        elif self.is_used(name):
-            raise DuplicatedNameError(name)
-        self._useset.add(name)
+        useset = self._useset
+        if name in useset or self._is_numbered(name):
+            if not deduplicate:
+                raise DuplicatedNameError(name)
+            name = self._next_name(name)
+        elif '.' in name:
+            # Make sure deduplicate() never generates this name
+            basename, _, ident = name.rpartition('.')
+            if ident.isdecimal():
+                ident = int(ident)
+                if ident > self._basenamemap.get(basename, 0):
+                    self._basenamemap[basename] = ident
+        useset.add(name)
         return name
 
     def deduplicate(self, name):
-        basename = name
-        while self.is_used(name):
-            ident = self._basenamemap[basename] + 1
-            self._basenamemap[basename] = ident
-            name = "{0}.{1}".format(basename, ident)
-        return name
+        if not self.is_used(name):
+            return name
+        return self._next_name(name)
+
+    def _next_name(self, basename):
+        # All the registered "<basename>.<N>" names have N <= the counter
+        ident = self._basenamemap.get(basename, 0) + 1
+        self._basenamemap[basename] = ident
+        return "{0}.{1}".format(basename, ident)
+
+    def defer(self, value):
+        """
+        Register the anonymous *value* (a NamedValue), whose name will
+        be assigned by materialize().
+        """
+        self._deferred.append(value)
+
+    def materialize(self, ordered=False):
+        """
+        Number the deferred values still anonymous, in creation order.
+
+        If *ordered* is true, those returned by the scope's *order*
+        callable are numbered first, in that order, then the others.
+        This walks all the values of the scope, so it is only meant to
+        be done once when they are all printed, while reading the name
+        of a single value only visits the newly deferred ones.
+        """
+        deferred = self._deferred
+        if not deferred:
+            return
+        self._deferred = []
+        values = deferred
+        if ordered and self._order is not None:
+            values = itertools.chain(self._order(), deferred)
+        next_name = self._next_name
+        for value in values:
+            if value._name is None:
+                value._name = next_name('')
 
     def get_child(self):
         return type(self)(parent=self)
 
 
 class _StrCaching(object):
+    # Slotted subclasses must declare a '_StrCaching__cached_str' slot
+    __slots__ = ()
 
     def _clear_string_cache(self):
         try:
@@ -50,6 +119,9 @@ class _StrCaching(object):
 
 
 class _StringReferenceCaching(object):
+    # Slotted subclasses must declare a
+    # '_StringReferenceCaching__cached_refstr' slot
+    __slots__ = ()
 
     def get_reference(self):
         try:
@@ -60,6 +132,25 @@ class _StringReferenceCaching(object):
 
 
 class _HasMetadata(object):
+    # The metadata mapping is only allocated when first accessed.
+    # Slotted subclasses must declare a '_metadata' slot.
+    __slots__ = ()
+    _metadata = None
+
+    @property
+    def metadata(self):
+        """
+        A dict mapping the metadata slot names of this value to the
+        attached metadata nodes.
+        """
+        metadata = self._metadata
+        if metadata is None:
+            metadata = self._metadata = {}
+        return metadata
+
+    @metadata.setter
+    def metadata(self, metadata):
+        self._metadata = metadata
 
     def set_metadata(self, name, node):
         """
@@ -67,14 +158,16 @@ class _HasMetadata(object):
         value.
         """
         self.metadata[name] = node
+        self._clear_string_cache()
 
     def _stringify_metadata(self, leading_comma=False):
-        if self.metadata:
+        metadata = self._metadata
+        if metadata:
             buf = []
             if leading_comma:
                 buf.append("")
             buf += ["!{0} {1}".format(k, v.get_reference())
-                    for k, v in self.metadata.items()]
+                    for k, v in metadata.items()]
             return ', '.join(buf)
         else:
             return ''
@@ -1,5 +1,7 @@
 import contextlib
 import functools
+import itertools
+import operator
 
 from llvmlite.ir import instructions, types, values
 
@@ -12,13 +14,169 @@ _CMP_MAP = {
     '<=': 'le',
 }
 
+# Instructions after which previously loaded values can't be reused
+_MEMORY_WRITES = (instructions.StoreInstr, instructions.StoreAtomicInstr,
+                  instructions.LoadAtomicInstr, instructions.CallInstr,
+                  instructions.AtomicRMW, instructions.CmpXchg,
+                  instructions.Fence)
+
+
+def _int_constant_value(val):
+    """
+    Return the value of *val* as an unsigned integer if it is a scalar
+    integer constant, None otherwise.
+    """
+    if (isinstance(val, values.Constant)
+            and isinstance(val.type, types.IntType)
+            and isinstance(val.constant, int)):
+        return val.constant & ((1 << val.type.width) - 1)
+    return None
+
+
+def _to_signed(value, width):
+    if value >> (width - 1):
+        return value - (1 << width)
+    return value
+
+
+def _int_constant(typ, value):
+    value &= (1 << typ.width) - 1
+    if typ.width == 1:
+        return values.Constant(typ, bool(value))
+    return values.Constant(typ, _to_signed(value, typ.width))
+
+
+def _fold_sdiv(lhs, rhs, width):
+    lhs = _to_signed(lhs, width)
+    rhs = _to_signed(rhs, width)
+    if rhs == 0 or (rhs == -1 and lhs == -(1 << (width - 1))):
+        # Undefined behaviour, leave it to LLVM
+        return None
+    quot = abs(lhs) // abs(rhs)
+    return quot if (lhs < 0) == (rhs < 0) else -quot
+
+
+def _fold_srem(lhs, rhs, width):
+    quot = _fold_sdiv(lhs, rhs, width)
+    if quot is None:
+        return None
+    return _to_signed(lhs, width) - _to_signed(rhs, width) * quot
+
+
+# Evaluation of the integer binary operations on unsigned operands.
+# None is returned when the result is poison or undefined.
+_INT_BINOPS = {
+    'add': lambda lhs, rhs, width: lhs + rhs,
+    'sub': lambda lhs, rhs, width: lhs - rhs,
+    'mul': lambda lhs, rhs, width: lhs * rhs,
+    'and': lambda lhs, rhs, width: lhs & rhs,
+    'or': lambda lhs, rhs, width: lhs | rhs,
+    'xor': lambda lhs, rhs, width: lhs ^ rhs,
+    'shl': lambda lhs, rhs, width: lhs << rhs if rhs < width else None,
+    'lshr': lambda lhs, rhs, width: lhs >> rhs if rhs < width else None,
+    'ashr': lambda lhs, rhs, width: (_to_signed(lhs, width) >> rhs
+                                     if rhs < width else None),
+    'udiv': lambda lhs, rhs, width: lhs // rhs if rhs else None,
+    'urem': lambda lhs, rhs, width: lhs % rhs if rhs else None,
+    'sdiv': _fold_sdiv,
+    'srem': _fold_srem,
+}
+
+# Operations for which a zero right operand gives back the left one
+_RIGHT_IDENTITY_ZERO = frozenset(['add', 'sub', 'or', 'xor',
+                                  'shl', 'lshr', 'ashr'])
+
+
+def _fold_binop(opname, lhs, rhs):
+    """
+    Fold the integer binary operation *opname* if both operands are
+    constants, or if it is a trivial identity such as ``x + 0`` or
+    ``x * 1``.  None is returned if the operation can't be folded.
+    """
+    fold = _INT_BINOPS.get(opname)
+    if fold is None:
+        return None
+    a = _int_constant_value(lhs)
+    b = _int_constant_value(rhs)
+    if a is None and b is None:
+        return None
+    typ = lhs.type
+    if a is not None and b is not None:
+        res = fold(a, b, typ.width)
+        return None if res is None else _int_constant(typ, res)
+    all_ones = (1 << typ.width) - 1
+    if b is not None:
+        const, other = b, lhs
+        if const == 0 and opname in _RIGHT_IDENTITY_ZERO:
+            return other
+        if const == 1 and opname in ('udiv', 'sdiv'):
+            return other
+    else:
+        const, other = a, rhs
+    # Commutative identities
+    if const == 0 and opname in ('add', 'or', 'xor'):
+        return other
+    if const == 1 and opname == 'mul':
+        return other
+    if const == all_ones and opname == 'and':
+        return other
+    if const == 0 and opname in ('mul', 'and'):
+        return _int_constant(typ, 0)
+    return None
+
+
+# Evaluation of the integer comparisons on unsigned operands
+_INT_CMPOPS = {
+    'eq': lambda lhs, rhs: lhs == rhs,
+    'ne': lambda lhs, rhs: lhs != rhs,
+    'ugt': lambda lhs, rhs: lhs > rhs,
+    'uge': lambda lhs, rhs: lhs >= rhs,
+    'ult': lambda lhs, rhs: lhs < rhs,
+    'ule': lambda lhs, rhs: lhs <= rhs,
+}
+
+
+def _fold_icmp(op, lhs, rhs):
+    a = _int_constant_value(lhs)
+    b = _int_constant_value(rhs)
+    if a is None or b is None:
+        return None
+    if op.startswith('s'):
+        width = lhs.type.width
+        a = _to_signed(a, width)
+        b = _to_signed(b, width)
+        op = 'u' + op[1:]
+    return values.Constant(types.IntType(1), _INT_CMPOPS[op](a, b))
+
+
+def _fold_cast(opname, val, typ):
+    if opname not in ('trunc', 'zext', 'sext'):
+        return None
+    value = _int_constant_value(val)
+    if value is None or not isinstance(typ, types.IntType):
+        return None
+    if opname == 'sext':
+        value = _to_signed(value, val.type.width)
+    return _int_constant(typ, value)
+
 
 def _unop(opname, cls=instructions.Instruction):
     def wrap(fn):
         @functools.wraps(fn)
         def wrapped(self, arg, name='', flags=()):
-            instr = cls(self.block, arg.type, opname, [arg], name, flags)
+            if self.cse:
+                key = (opname, arg, tuple(flags))
+                instr = self._cse_lookup(key)
+                if instr is not None:
+                    return instr
+            if self.validate:
+                instr = cls(self.block, arg.type, opname, [arg], name, flags)
+            else:
+                [instr] = cls._create_many(self.block, arg.type, opname,
+                                           ([arg],), name, flags)
             self._insert(instr)
+            if self.cse:
+                self._cse_record(key, instr)
             return instr
 
         return wrapped
@@ -30,11 +188,27 @@ def _binop(opname, cls=instructions.Instruction):
     def wrap(fn):
         @functools.wraps(fn)
         def wrapped(self, lhs, rhs, name='', flags=()):
-            if lhs.type != rhs.type:
+            if self.validate and lhs.type != rhs.type:
                 raise ValueError("Operands must be the same type, got (%s, %s)"
                                  % (lhs.type, rhs.type))
-            instr = cls(self.block, lhs.type, opname, (lhs, rhs), name, flags)
+            if self.fold_constants:
+                folded = _fold_binop(opname, lhs, rhs)
+                if folded is not None:
+                    return folded
+            if self.cse:
+                key = (opname, lhs, rhs, tuple(flags))
+                instr = self._cse_lookup(key)
+                if instr is not None:
+                    return instr
+            if self.validate:
+                instr = cls(self.block, lhs.type, opname, (lhs, rhs), name,
+                            flags)
+            else:
+                [instr] = cls._create_many(self.block, lhs.type, opname,
+                                           ((lhs, rhs),), name, flags)
             self._insert(instr)
+            if self.cse:
+                self._cse_record(key, instr)
             return instr
 
         return wrapped
@@ -42,6 +216,37 @@ def _binop(opname, cls=instructions.Instruction):
     return wrap
 
 
+def _binop_many(opname, cls=instructions.Instruction):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def wrapped(self, lhs, rhs, name='', flags=()):
+            if len(lhs) != len(rhs):
+                raise ValueError("Operand lists must have the same length, "
+                                 "got (%d, %d)" % (len(lhs), len(rhs)))
+            if not lhs:
+                return []
+            ty = lhs[0].type
+            if self.validate:
+                for val in itertools.chain(lhs, rhs):
+                    # Types are interned, so the identity check is enough
+                    # in most cases
+                    if val.type is not ty and val.type != ty:
+                        raise ValueError("Operands must be the same type, "
+                                         "got (%s, %s)" % (ty, val.type))
+            if self.fold_constants or self.cse:
+                # Fold and reuse values as the single operation does
+                single = getattr(self, opname)
+                return [single(a, b, name, flags) for a, b in zip(lhs, rhs)]
+            instrs = cls._create_many(self.block, ty, opname,
+                                      list(zip(lhs, rhs)), name, flags)
+            self._insert_many(instrs)
+            return instrs
+
+        return wrapped
+
+    return wrap
+
+
 def _binop_with_overflow(opname, cls=instructions.Instruction):
     def wrap(fn):
         @functools.wraps(fn)
@@ -71,7 +276,11 @@ def _uniop(opname, cls=instructions.Instruction):
     def wrap(fn):
         @functools.wraps(fn)
         def wrapped(self, operand, name=''):
-            instr = cls(self.block, operand.type, opname, [operand], name)
+            if self.validate:
+                instr = cls(self.block, operand.type, opname, [operand], name)
+            else:
+                [instr] = cls._create_many(self.block, operand.type, opname,
+                                           ([operand],), name)
             self._insert(instr)
             return instr
 
@@ -161,8 +370,19 @@ def _castop(opname, cls=instructions.CastInstr):
         def wrapped(self, val, typ, name=''):
             if val.type == typ:
                 return val
+            if self.fold_constants:
+                folded = _fold_cast(opname, val, typ)
+                if folded is not None:
+                    return folded
+            if self.cse:
+                key = (opname, val, typ)
+                instr = self._cse_lookup(key)
+                if instr is not None:
+                    return instr
             instr = cls(self.block, opname, val, typ, name)
             self._insert(instr)
+            if self.cse:
+                self._cse_record(key, instr)
             return instr
 
         return wrapped
@@ -187,10 +407,23 @@ def _label_suffix(label, suffix):
 
 
 class IRBuilder(object):
-    def __init__(self, block=None):
+    def __init__(self, block=None, validate=True, fold_constants=False,
+                 cse=False):
         self._block = block
         self._anchor = len(block.instructions) if block else 0
         self.debug_metadata = None
+        # Whether to check the operands of the instructions, see
+        # the documentation
+        self.validate = validate
+        # Whether to return constants and operands, rather than new
+        # instructions, for the operations which can be simplified
+        self.fold_constants = fold_constants
+        # Whether to reuse the identical instructions already computed
+        # in the current block, see _get_cse_table()
+        self.cse = cse
+        self._cse_block = None
+        self._cse_tables = ({}, {})
+        self._cse_ninstrs = 0
 
     @property
     def block(self):
@@ -256,6 +489,8 @@ class IRBuilder(object):
         """Remove the given instruction."""
         idx = self._block.instructions.index(instr)
         del self._block.instructions[idx]
+        if self.module.track_uses:
+            instr._remove_uses()
         if self._block.terminator == instr:
             self._block.terminator = None
         if self._anchor > idx:
@@ -353,6 +588,86 @@ class IRBuilder(object):
             instr.metadata['dbg'] = self.debug_metadata
         self._block.instructions.insert(self._anchor, instr)
         self._anchor += 1
+        if self.cse:
+            self._cse_inserted(1, isinstance(instr, _MEMORY_WRITES))
+
+    def _insert_many(self, instrs):
+        if self.debug_metadata is not None:
+            for instr in instrs:
+                if 'dbg' not in instr.metadata:
+                    instr.metadata['dbg'] = self.debug_metadata
+        anchor = self._anchor
+        self._block.instructions[anchor:anchor] = instrs
+        self._anchor = anchor + len(instrs)
+        if self.cse:
+            self._cse_inserted(len(instrs),
+                               any(isinstance(instr, _MEMORY_WRITES)
+                                   for instr in instrs))
+
+    def _get_cse_table(self, loads=False):
+        """
+        Return the table of the instructions which can be reused in the
+        current block (the loads if *loads* is true), or None if the
+        builder isn't appending to the block, as the instructions after
+        the insertion point can't be reused.
+
+        Only the tables of the current block are kept.  The loads are
+        forgotten if the number of instructions in the block changed
+        behind the builder's back (e.g. another builder inserted a store),
+        and the entries are checked again when found, see _cse_lookup().
+        """
+        block = self._block
+        ninstrs = len(block.instructions)
+        if block is not self._cse_block:
+            self._cse_block = block
+            self._cse_tables = ({}, {})
+        elif ninstrs != self._cse_ninstrs:
+            self._cse_tables[1].clear()
+        self._cse_ninstrs = ninstrs
+        anchor = self._anchor
+        if anchor != ninstrs and not (block.is_terminated
+                                      and anchor == ninstrs - 1):
+            return None
+        return self._cse_tables[loads]
+
+    def _cse_lookup(self, key, loads=False):
+        table = self._get_cse_table(loads)
+        if table is None:
+            return None
+        entry = table.get(key)
+        if entry is None:
+            return None
+        # The instruction may have been removed or replaced (e.g. with
+        # Block.replace()), or its operands rewritten (e.g. with
+        # replace_all_uses_with()) since it was recorded
+        instr, pos, operands, flags = entry
+        instrs = self._block.instructions
+        if (pos < len(instrs) and instrs[pos] is instr
+                and instr.parent is self._block
+                and len(instr.operands) == len(operands)
+                and all(map(operator.is_, instr.operands, operands))
+                and tuple(instr._flags or ()) == flags):
+            return instr
+        del table[key]
+        return None
+
+    def _cse_record(self, key, instr, loads=False):
+        table = self._get_cse_table(loads)
+        if table is not None:
+            # The instruction was just inserted before the anchor
+            table[key] = (instr, self._anchor - 1, tuple(instr.operands),
+                          tuple(instr._flags or ()))
+
+    def _cse_inserted(self, count, writes_memory):
+        # Account for *count* instructions inserted by the builder, unless
+        # the block was also changed by other means, which the next call
+        # to _get_cse_table() will notice
+        if self._block is self._cse_block:
+            ninstrs = len(self._block.instructions)
+            if self._cse_ninstrs == ninstrs - count:
+                self._cse_ninstrs = ninstrs
+            if writes_memory:
+                self._cse_tables[1].clear()
 
     def _set_terminator(self, term):
         assert not self.block.is_terminated
@@ -427,6 +742,54 @@ class IRBuilder(object):
             name = lhs * rhs
         """
 
+    @_binop_many('add')
+    def add_many(self, lhs, rhs, name=''):
+        """
+        Integer addition of the pairs of values of the *lhs* and *rhs*
+        sequences.  A list of instructions is returned:
+            name[i] = lhs[i] + rhs[i]
+        """
+
+    @_binop_many('fadd')
+    def fadd_many(self, lhs, rhs, name=''):
+        """
+        Floating-point addition of the pairs of values of the *lhs* and
+        *rhs* sequences.  A list of instructions is returned:
+            name[i] = lhs[i] + rhs[i]
+        """
+
+    @_binop_many('sub')
+    def sub_many(self, lhs, rhs, name=''):
+        """
+        Integer subtraction of the pairs of values of the *lhs* and *rhs*
+        sequences.  A list of instructions is returned:
+            name[i] = lhs[i] - rhs[i]
+        """
+
+    @_binop_many('fsub')
+    def fsub_many(self, lhs, rhs, name=''):
+        """
+        Floating-point subtraction of the pairs of values of the *lhs* and
+        *rhs* sequences.  A list of instructions is returned:
+            name[i] = lhs[i] - rhs[i]
+        """
+
+    @_binop_many('mul')
+    def mul_many(self, lhs, rhs, name=''):
+        """
+        Integer multiplication of the pairs of values of the *lhs* and
+        *rhs* sequences.  A list of instructions is returned:
+            name[i] = lhs[i] * rhs[i]
+        """
+
+    @_binop_many('fmul')
+    def fmul_many(self, lhs, rhs, name=''):
+        """
+        Floating-point multiplication of the pairs of values of the *lhs*
+        and *rhs* sequences.  A list of instructions is returned:
+            name[i] = lhs[i] * rhs[i]
+        """
+
     @_binop('udiv')
     def udiv(self, lhs, rhs, name=''):
         """
@@ -572,8 +935,19 @@ class IRBuilder(object):
             raise ValueError("invalid comparison %r for icmp" % (cmpop,))
         if cmpop not in ('==', '!='):
             op = prefix + op
+        if self.fold_constants:
+            folded = _fold_icmp(op, lhs, rhs)
+            if folded is not None:
+                return folded
+        if self.cse:
+            key = ('icmp', op, lhs, rhs)
+            instr = self._cse_lookup(key)
+            if instr is not None:
+                return instr
         instr = instructions.ICMPInstr(self.block, op, lhs, rhs, name=name)
         self._insert(instr)
+        if self.cse:
+            self._cse_record(key, instr)
         return instr
 
     def icmp_signed(self, cmpop, lhs, rhs, name=''):
@@ -594,6 +968,19 @@ class IRBuilder(object):
         """
         return self._icmp('u', cmpop, lhs, rhs, name)
 
+    def _fcmp(self, op, lhs, rhs, name, flags):
+        if self.cse:
+            key = ('fcmp', op, lhs, rhs, tuple(flags))
+            instr = self._cse_lookup(key)
+            if instr is not None:
+                return instr
+        instr = instructions.FCMPInstr(
+            self.block, op, lhs, rhs, name=name, flags=flags)
+        self._insert(instr)
+        if self.cse:
+            self._cse_record(key, instr)
+        return instr
+
     def fcmp_ordered(self, cmpop, lhs, rhs, name='', flags=()):
         """
         Floating-point ordered comparison:
@@ -605,10 +992,7 @@ class IRBuilder(object):
             op = 'o' + _CMP_MAP[cmpop]
         else:
             op = cmpop
-        instr = instructions.FCMPInstr(
-            self.block, op, lhs, rhs, name=name, flags=flags)
-        self._insert(instr)
-        return instr
+        return self._fcmp(op, lhs, rhs, name, flags)
 
     def fcmp_unordered(self, cmpop, lhs, rhs, name='', flags=()):
         """
@@ -621,19 +1005,27 @@ class IRBuilder(object):
             op = 'u' + _CMP_MAP[cmpop]
         else:
             op = cmpop
-        instr = instructions.FCMPInstr(
-            self.block, op, lhs, rhs, name=name, flags=flags)
-        self._insert(instr)
-        return instr
+        return self._fcmp(op, lhs, rhs, name, flags)
 
     def select(self, cond, lhs, rhs, name='', flags=()):
         """
         Ternary select operator:
             name = cond ? lhs : rhs
         """
+        if self.fold_constants:
+            value = _int_constant_value(cond)
+            if value is not None:
+                return lhs if value else rhs
+        if self.cse:
+            key = ('select', cond, lhs, rhs, tuple(flags))
+            instr = self._cse_lookup(key)
+            if instr is not None:
+                return instr
         instr = instructions.SelectInstr(self.block, cond, lhs, rhs, name=name,
                                          flags=flags)
         self._insert(instr)
+        if self.cse:
+            self._cse_record(key, instr)
         return instr
 
     #
@@ -764,12 +1156,19 @@ class IRBuilder(object):
         Load value from pointer, with optional guaranteed alignment:
             name = *ptr
         """
-        if not isinstance(ptr.type, types.PointerType):
+        if self.validate and not isinstance(ptr.type, types.PointerType):
             msg = "cannot load from value of type %s (%r): not a pointer"
             raise TypeError(msg % (ptr.type, str(ptr)))
+        if self.cse:
+            key = (ptr, typ, align)
+            ld = self._cse_lookup(key, loads=True)
+            if ld is not None:
+                return ld
         ld = instructions.LoadInstr(self.block, ptr, name, typ=typ)
         ld.align = align
         self._insert(ld)
+        if self.cse:
+            self._cse_record(key, ld, loads=True)
         return ld
 
     def store(self, value, ptr, align=None):
@@ -777,17 +1176,61 @@ class IRBuilder(object):
         Store value to pointer, with optional guaranteed alignment:
             *ptr = name
         """
-        if not isinstance(ptr.type, types.PointerType):
-            msg = "cannot store to value of type %s (%r): not a pointer"
-            raise TypeError(msg % (ptr.type, str(ptr)))
-        if not ptr.type.is_opaque and ptr.type.pointee != value.type:
-            raise TypeError("cannot store %s to %s: mismatching types"
-                            % (value.type, ptr.type))
+        if self.validate:
+            if not isinstance(ptr.type, types.PointerType):
+                msg = "cannot store to value of type %s (%r): not a pointer"
+                raise TypeError(msg % (ptr.type, str(ptr)))
+            if not ptr.type.is_opaque and ptr.type.pointee != value.type:
+                raise TypeError("cannot store %s to %s: mismatching types"
+                                % (value.type, ptr.type))
         st = instructions.StoreInstr(self.block, value, ptr)
         st.align = align
         self._insert(st)
         return st
 
+    def load_many(self, ptrs, name='', align=None, typ=None):
+        """
+        Load values from each pointer of the *ptrs* sequence.  A list of
+        instructions is returned:
+            name[i] = *ptrs[i]
+        """
+        if self.validate:
+            for ptr in ptrs:
+                if not isinstance(ptr.type, types.PointerType):
+                    msg = ("cannot load from value of type %s (%r): "
+                           "not a pointer")
+                    raise TypeError(msg % (ptr.type, str(ptr)))
+        if self.cse:
+            # Reuse the values loaded before, as load() does
+            return [self.load(ptr, name, align, typ) for ptr in ptrs]
+        instrs = instructions.LoadInstr._create_loads(self.block, ptrs, name,
+                                                      typ, align)
+        self._insert_many(instrs)
+        return instrs
+
+    def store_many(self, values, ptrs, align=None):
+        """
+        Store each value of the *values* sequence to the pointer at the
+        same position in *ptrs*.  A list of instructions is returned:
+            *ptrs[i] = values[i]
+        """
+        if len(values) != len(ptrs):
+            raise ValueError("Value and pointer lists must have the same "
+                             "length, got (%d, %d)" % (len(values), len(ptrs)))
+        if self.validate:
+            for value, ptr in zip(values, ptrs):
+                if not isinstance(ptr.type, types.PointerType):
+                    msg = ("cannot store to value of type %s (%r): "
+                           "not a pointer")
+                    raise TypeError(msg % (ptr.type, str(ptr)))
+                if not ptr.type.is_opaque and ptr.type.pointee != value.type:
+                    raise TypeError("cannot store %s to %s: mismatching types"
+                                    % (value.type, ptr.type))
+        instrs = instructions.StoreInstr._create_stores(self.block, values,
+                                                        ptrs, align)
+        self._insert_many(instrs)
+        return instrs
+
     def load_atomic(self, ptr, ordering, align, name='', typ=None):
         """
         Load value from pointer, with optional guaranteed alignment:
@@ -930,12 +1373,37 @@ class IRBuilder(object):
         Compute effective address (getelementptr):
             name = getelementptr ptr, <indices...>
         """
+        if self.cse:
+            key = ('getelementptr', ptr, tuple(indices), inbounds,
+                   source_etype)
+            instr = self._cse_lookup(key)
+            if instr is not None:
+                return instr
         instr = instructions.GEPInstr(self.block, ptr, indices,
                                       inbounds=inbounds, name=name,
                                       source_etype=source_etype)
         self._insert(instr)
+        if self.cse:
+            self._cse_record(key, instr)
         return instr
 
+    def gep_many(self, ptr, indices_list, inbounds=False, name='',
+                 source_etype=None):
+        """
+        Compute the effective addresses of *ptr* with each sequence of
+        indices of *indices_list*.  A list of instructions is returned:
+            name[i] = getelementptr ptr, <indices_list[i]...>
+        """
+        if self.cse:
+            # Reuse the addresses computed before, as gep() does
+            return [self.gep(ptr, indices, inbounds, name, source_etype)
+                    for indices in indices_list]
+        instrs = instructions.GEPInstr._create_geps(self.block, ptr,
+                                                    indices_list, inbounds,
+                                                    name, source_etype)
+        self._insert_many(instrs)
+        return instrs
+
     # Vector Operations APIs
 
     def extract_element(self, vector, idx, name=''):
@@ -977,8 +1445,15 @@ class IRBuilder(object):
         """
         if not isinstance(idx, (tuple, list)):
             idx = [idx]
+        if self.cse:
+            key = ('extractvalue', agg, tuple(idx))
+            instr = self._cse_lookup(key)
+            if instr is not None:
+                return instr
         instr = instructions.ExtractValue(self.block, agg, idx, name=name)
         self._insert(instr)
+        if self.cse:
+            self._cse_record(key, instr)
         return instr
 
     def insert_value(self, agg, value, idx, name=''):
@@ -3,18 +3,59 @@ from llvmlite.ir import types
 
 
 class Context(object):
-    def __init__(self):
+    def __init__(self, parent=None):
+        self.parent = parent
         self.scope = _utils.NameScope()
         self.identified_types = {}
 
     def get_identified_type(self, name, packed=False):
-        if name not in self.identified_types:
+        ty = self._lookup_identified_type(name)
+        if ty is None:
             self.scope.register(name)
             ty = types.IdentifiedStructType(self, name, packed)
             self.identified_types[name] = ty
-        else:
-            ty = self.identified_types[name]
         return ty
 
+    def _lookup_identified_type(self, name):
+        ctx = self
+        while ctx is not None:
+            ty = ctx.identified_types.get(name)
+            if ty is not None:
+                return ty
+            ctx = ctx.parent
+        return None
+
+    def get_all_identified_types(self):
+        """
+        Return a dict of the identified types visible in this context,
+        including those of the parent contexts.
+        """
+        if self.parent is None:
+            return self.identified_types
+        all_types = dict(self.parent.get_all_identified_types())
+        all_types.update(self.identified_types)
+        return all_types
+
+    def child(self):
+        """
+        Create a child context.  The identified types of this context
+        (and its parents) are visible in the child, while those created
+        in the child are only kept by the child.
+        """
+        return type(self)(parent=self)
+
+    def close(self):
+        """
+        Forget the identified types created in this context.
+        """
+        self.identified_types = {}
+        self.scope = _utils.NameScope()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 global_context = Context()
@@ -2,6 +2,8 @@
 Implementation of LLVM IR instructions.
 """
 
+import array
+
 from llvmlite.ir import types
 from llvmlite.ir.values import (Block, Function, Value, NamedValue, Constant,
                                 MetaDataArgument, MetaDataString, AttributeSet,
@@ -9,15 +11,91 @@ from llvmlite.ir.values import (Block, Function, Value, NamedValue, Constant,
 from llvmlite.ir._utils import _HasMetadata
 
 
+def _format_operands(operands):
+    """
+    Format *operands* as a comma-separated list of "<type> <reference>".
+    """
+    return ', '.join([str(op.type) + ' ' + op.get_reference()
+                      for op in operands])
+
+
 class Instruction(NamedValue, _HasMetadata):
+    # Subclasses should declare __slots__ for their own attributes, so
+    # that they aren't stored in the instance dict.
+    __slots__ = ('opname', 'operands', '_flags', '_metadata')
+
     def __init__(self, parent, typ, opname, operands, name='', flags=()):
         super(Instruction, self).__init__(parent, typ, name=name)
         assert isinstance(parent, Block)
         assert isinstance(flags, (tuple, list))
         self.opname = opname
         self.operands = operands
-        self.flags = list(flags)
-        self.metadata = {}
+        # The flags list and metadata dict are allocated on first access
+        self._flags = list(flags) if flags else None
+        self._metadata = None
+        if self.module.track_uses:
+            self._add_uses()
+
+    @classmethod
+    def _create_many(cls, parent, typ, opname, operands_list, name='',
+                     flags=()):
+        """
+        Create one instruction for each operand tuple of *operands_list*,
+        as the constructor would, but checking the arguments and looking
+        up the scope only once.  Subclasses with their own constructor
+        are created through it.
+        """
+        if cls.__init__ is not Instruction.__init__:
+            return [cls(parent, typ, opname, operands, name, flags)
+                    for operands in operands_list]
+        assert isinstance(typ, types.Type)
+        return cls._new_many(parent, opname,
+                             [(typ, operands) for operands in operands_list],
+                             name, flags)
+
+    @classmethod
+    def _new_many(cls, parent, opname, typed_operands, name='', flags=()):
+        """
+        Create one instruction for each (type, operands) pair of
+        *typed_operands*, without calling the constructor.  The attributes
+        specific to *cls* are left for the caller to set.
+        """
+        assert isinstance(parent, Block)
+        assert isinstance(flags, (tuple, list))
+        scope = parent.scope
+        lazy = not name and scope.lazy and cls.deduplicate_name
+        track_uses = parent.module.track_uses
+        new = cls.__new__
+        instrs = []
+        for typ, operands in typed_operands:
+            instr = new(cls)
+            instr.parent = parent
+            instr.type = typ
+            instr._users = None
+            if lazy:
+                instr._name = None
+                scope.defer(instr)
+            else:
+                instr._name = scope.register(name, deduplicate=True)
+            instr.opname = opname
+            instr.operands = operands
+            instr._flags = list(flags) if flags else None
+            instr._metadata = None
+            if track_uses:
+                instr._add_uses()
+            instrs.append(instr)
+        return instrs
+
+    @property
+    def flags(self):
+        flags = self._flags
+        if flags is None:
+            flags = self._flags = []
+        return flags
+
+    @flags.setter
+    def flags(self, flags):
+        self._flags = flags
 
     @property
     def function(self):
@@ -29,13 +107,42 @@ class Instruction(NamedValue, _HasMetadata):
 
     def descr(self, buf):
         opname = self.opname
-        if self.flags:
-            opname = ' '.join([opname] + self.flags)
-        operands = ', '.join([op.get_reference() for op in self.operands])
-        typ = self.type
-        metadata = self._stringify_metadata(leading_comma=True)
-        buf.append("{0} {1} {2}{3}\n"
-                   .format(opname, typ, operands, metadata))
+        if self._flags:
+            opname = ' '.join([opname] + self._flags)
+        buf += (opname, ' ', str(self.type), ' ',
+                ', '.join([op.get_reference() for op in self.operands]),
+                self._stringify_metadata(leading_comma=True), '\n')
+
+    def _get_used_values(self):
+        """
+        Return the values used by this instruction, as replaced by
+        replace_usage().
+        """
+        return self.operands
+
+    def _add_uses(self):
+        for value in self._get_used_values():
+            if isinstance(value, NamedValue):
+                value._add_user(self)
+
+    def _remove_uses(self):
+        for value in self._get_used_values():
+            if isinstance(value, NamedValue):
+                value._remove_user(self)
+
+    def _update_uses(self, *values):
+        """
+        Update the use tracking of *values* after they were added to or
+        removed from the values used by this instruction.
+        """
+        if self.module.track_uses:
+            used = self._get_used_values()
+            for value in values:
+                if isinstance(value, NamedValue):
+                    if any(v is value for v in used):
+                        value._add_user(self)
+                    else:
+                        value._remove_user(self)
 
     def replace_usage(self, old, new):
         if old in self.operands:
@@ -44,6 +151,12 @@ class Instruction(NamedValue, _HasMetadata):
                 ops.append(new if op is old else op)
             self.operands = tuple(ops)
             self._clear_string_cache()
+            self._update_uses(old, new)
+
+    def _clear_string_cache(self):
+        super(Instruction, self)._clear_string_cache()
+        # Invalidate the cached text of the enclosing block and function
+        self.parent._clear_string_cache()
 
     def __repr__(self):
         return "<ir.%s %r of type '%s', opname %r, operands %r>" % (
@@ -65,6 +178,8 @@ class FastMathFlags(AttributeSet):
 
 
 class CallInstr(Instruction):
+    __slots__ = ('cconv', 'tail', 'fastmath', 'attributes', 'arg_attributes')
+
     def __init__(self, parent, func, args, name='', cconv=None, tail=None,
                  fastmath=(), attrs=(), arg_attrs=None):
         self.cconv = (func.calling_convention
@@ -114,7 +229,10 @@ class CallInstr(Instruction):
 
     @callee.setter
     def callee(self, newcallee):
+        oldcallee = self.operands[0]
         self.operands[0] = newcallee
+        self._clear_string_cache()
+        self._update_uses(oldcallee, newcallee)
 
     @property
     def args(self):
@@ -136,7 +254,7 @@ class CallInstr(Instruction):
                 attrs = ' '.join(self.arg_attributes[i]._to_list(a.type)) + ' '
             else:
                 attrs = ''
-            return '{0} {1}{2}'.format(a.type, attrs, a.get_reference())
+            return str(a.type) + ' ' + attrs + a.get_reference()
         args = ', '.join([descr_arg(i, a) for i, a in enumerate(self.args)])
 
         fnty = self.callee.function_type
@@ -147,7 +265,7 @@ class CallInstr(Instruction):
         else:
             # Fastmath flag work only in this case
             ty = fnty.return_type
-        callee_ref = "{0} {1}".format(ty, self.callee.get_reference())
+        callee_ref = str(ty) + ' ' + self.callee.get_reference()
         if self.cconv:
             callee_ref = "{0} {1}".format(self.cconv, callee_ref)
 
@@ -161,22 +279,18 @@ class CallInstr(Instruction):
         fm_attrs = ' ' + ' '.join(self.fastmath._to_list(fnty.return_type))\
             if self.fastmath else ''
 
-        buf.append("{tail}{op}{fastmath} {callee}({args}){attr}{meta}\n".format(
-            tail=tail_marker,
-            op=self.opname,
-            callee=callee_ref,
-            fastmath=fm_attrs,
-            args=args,
-            attr=fn_attrs,
-            meta=(self._stringify_metadata(leading_comma=True)
-                  if add_metadata else ""),
-        ))
+        buf += (tail_marker, self.opname, fm_attrs, ' ', callee_ref,
+                '(', args, ')', fn_attrs,
+                (self._stringify_metadata(leading_comma=True)
+                 if add_metadata else ""), '\n')
 
     def descr(self, buf):
         self._descr(buf, add_metadata=True)
 
 
 class InvokeInstr(CallInstr):
+    __slots__ = ('normal_to', 'unwind_to')
+
     def __init__(self, parent, func, args, normal_to, unwind_to, name='',
                  cconv=None, fastmath=(), attrs=(), arg_attrs=None):
         assert isinstance(normal_to, Block)
@@ -198,19 +312,19 @@ class InvokeInstr(CallInstr):
 
 
 class Terminator(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent, opname, operands):
         super(Terminator, self).__init__(parent, types.VoidType(), opname,
                                          operands)
 
     def descr(self, buf):
-        opname = self.opname
-        operands = ', '.join(["{0} {1}".format(op.type, op.get_reference())
-                              for op in self.operands])
-        metadata = self._stringify_metadata(leading_comma=True)
-        buf.append("{0} {1}{2}".format(opname, operands, metadata))
+        buf += (self.opname, ' ', _format_operands(self.operands),
+                self._stringify_metadata(leading_comma=True))
 
 
 class PredictableInstr(Instruction):
+    __slots__ = ()
 
     def set_weights(self, weights):
         operands = [MetaDataString(self.module, "branch_weights")]
@@ -223,6 +337,8 @@ class PredictableInstr(Instruction):
 
 
 class Ret(Terminator):
+    __slots__ = ()
+
     def __init__(self, parent, opname, return_value=None):
         operands = [return_value] if return_value is not None else []
         super(Ret, self).__init__(parent, opname, operands)
@@ -238,23 +354,23 @@ class Ret(Terminator):
         return_value = self.return_value
         metadata = self._stringify_metadata(leading_comma=True)
         if return_value is not None:
-            buf.append("{0} {1} {2}{3}\n"
-                       .format(self.opname, return_value.type,
-                               return_value.get_reference(),
-                               metadata))
+            buf += (self.opname, ' ', str(return_value.type), ' ',
+                    return_value.get_reference(), metadata, '\n')
         else:
-            buf.append("{0}{1}\n".format(self.opname, metadata))
+            buf += (self.opname, metadata, '\n')
 
 
 class Branch(Terminator):
-    pass
+    __slots__ = ()
 
 
 class ConditionalBranch(PredictableInstr, Terminator):
-    pass
+    __slots__ = ()
 
 
 class IndirectBranch(PredictableInstr, Terminator):
+    __slots__ = ('destinations',)
+
     def __init__(self, parent, opname, addr):
         super(IndirectBranch, self).__init__(parent, opname, [addr])
         self.destinations = []
@@ -266,6 +382,7 @@ class IndirectBranch(PredictableInstr, Terminator):
     def add_destination(self, block):
         assert isinstance(block, Block)
         self.destinations.append(block)
+        self._clear_string_cache()
 
     def descr(self, buf):
         destinations = ["label {0}".format(blk.get_reference())
@@ -279,6 +396,7 @@ class IndirectBranch(PredictableInstr, Terminator):
 
 
 class SwitchInstr(PredictableInstr, Terminator):
+    __slots__ = ('default', 'cases')
 
     def __init__(self, parent, opname, val, default):
         super(SwitchInstr, self).__init__(parent, opname, [val])
@@ -294,6 +412,7 @@ class SwitchInstr(PredictableInstr, Terminator):
         if not isinstance(val, Value):
             val = Constant(self.value.type, val)
         self.cases.append((val, block))
+        self._clear_string_cache()
 
     def descr(self, buf):
         cases = ["{0} {1}, label {2}".format(val.type, val.get_reference(),
@@ -309,10 +428,12 @@ class SwitchInstr(PredictableInstr, Terminator):
 
 
 class Resume(Terminator):
-    pass
+    __slots__ = ()
 
 
 class SelectInstr(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent, cond, lhs, rhs, name='', flags=()):
         assert lhs.type == rhs.type
         super(SelectInstr, self).__init__(parent, lhs.type, "select",
@@ -332,16 +453,17 @@ class SelectInstr(Instruction):
         return self.operands[2]
 
     def descr(self, buf):
-        buf.append("select {0} {1} {2}, {3} {4}, {5} {6} {7}\n".format(
-            ' '.join(self.flags),
-            self.cond.type, self.cond.get_reference(),
-            self.lhs.type, self.lhs.get_reference(),
-            self.rhs.type, self.rhs.get_reference(),
-            self._stringify_metadata(leading_comma=True),
-        ))
+        cond, lhs, rhs = self.operands
+        buf += ('select ', ' '.join(self._flags or ()), ' ',
+                str(cond.type), ' ', cond.get_reference(), ', ',
+                str(lhs.type), ' ', lhs.get_reference(), ', ',
+                str(rhs.type), ' ', rhs.get_reference(), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class CompareInstr(Instruction):
+    __slots__ = ('op',)
+
     # Define the following in subclasses
     OPNAME = 'invalid-compare'
     VALID_OP = {}
@@ -363,18 +485,18 @@ class CompareInstr(Instruction):
         self.op = op
 
     def descr(self, buf):
-        buf.append("{opname}{flags} {op} {ty} {lhs}, {rhs} {meta}\n".format(
-            opname=self.opname,
-            flags=''.join(' ' + it for it in self.flags),
-            op=self.op,
-            ty=self.operands[0].type,
-            lhs=self.operands[0].get_reference(),
-            rhs=self.operands[1].get_reference(),
-            meta=self._stringify_metadata(leading_comma=True),
-        ))
+        lhs, rhs = self.operands
+        buf.append(self.opname)
+        if self._flags:
+            buf += [' ' + it for it in self._flags]
+        buf += (' ', self.op, ' ', str(lhs.type), ' ', lhs.get_reference(),
+                ', ', rhs.get_reference(), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class ICMPInstr(CompareInstr):
+    __slots__ = ()
+
     OPNAME = 'icmp'
     VALID_OP = {
         'eq': 'equal',
@@ -392,6 +514,8 @@ class ICMPInstr(CompareInstr):
 
 
 class FCMPInstr(CompareInstr):
+    __slots__ = ()
+
     OPNAME = 'fcmp'
     VALID_OP = {
         'false': 'no comparison, always returns false',
@@ -416,53 +540,83 @@ class FCMPInstr(CompareInstr):
 
 
 class CastInstr(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent, op, val, typ, name=''):
         super(CastInstr, self).__init__(parent, typ, op, [val], name=name)
 
     def descr(self, buf):
-        buf.append("{0} {1} {2} to {3} {4}\n".format(
-            self.opname,
-            self.operands[0].type,
-            self.operands[0].get_reference(),
-            self.type,
-            self._stringify_metadata(leading_comma=True),
-        ))
+        [val] = self.operands
+        buf += (self.opname, ' ', str(val.type), ' ', val.get_reference(),
+                ' to ', str(self.type), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
+
+
+def _load_type(ptr, typ):
+    if typ is None:
+        if isinstance(ptr, AllocaInstr):
+            typ = ptr.allocated_type
+        # For compatibility with typed pointers. Eventually this should
+        # probably be removed (when typed pointers are fully removed).
+        elif not ptr.type.is_opaque:
+            typ = ptr.type.pointee
+        else:
+            raise ValueError("Load lacks type.")
+    return typ
 
 
 class LoadInstr(Instruction):
+    __slots__ = ('align',)
 
     def __init__(self, parent, ptr, name='', typ=None):
-        if typ is None:
-            if isinstance(ptr, AllocaInstr):
-                typ = ptr.allocated_type
-            # For compatibility with typed pointers. Eventually this should
-            # probably be removed (when typed pointers are fully removed).
-            elif not ptr.type.is_opaque:
-                typ = ptr.type.pointee
-            else:
-                raise ValueError("Load lacks type.")
+        typ = _load_type(ptr, typ)
         super(LoadInstr, self).__init__(parent, typ, "load", [ptr], name=name)
         self.align = None
 
+    @classmethod
+    def _create_loads(cls, parent, ptrs, name='', typ=None, align=None):
+        """
+        Create a load from each pointer of *ptrs*, as the constructor would.
+        """
+        instrs = cls._new_many(parent, "load",
+                               [(_load_type(ptr, typ), [ptr])
+                                for ptr in ptrs], name)
+        for instr in instrs:
+            instr.align = align
+        return instrs
+
     def descr(self, buf):
         [val] = self.operands
         if self.align is not None:
             align = ', align %d' % (self.align)
         else:
             align = ''
-        buf.append("load {0}, {1} {2}{3}{4}\n".format(
-            self.type,
-            val.type,
-            val.get_reference(),
-            align,
-            self._stringify_metadata(leading_comma=True),
-        ))
+        buf += ('load ', str(self.type), ', ', str(val.type), ' ',
+                val.get_reference(), align,
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class StoreInstr(Instruction):
+    __slots__ = ('align',)
+
     def __init__(self, parent, val, ptr):
         super(StoreInstr, self).__init__(parent, types.VoidType(), "store",
                                          [val, ptr])
+        self.align = None
+
+    @classmethod
+    def _create_stores(cls, parent, values, ptrs, align=None):
+        """
+        Create a store of each value of *values* to the pointer at the same
+        position in *ptrs*, as the constructor would.
+        """
+        void = types.VoidType()
+        instrs = cls._new_many(parent, "store",
+                               [(void, [val, ptr])
+                                for val, ptr in zip(values, ptrs)])
+        for instr in instrs:
+            instr.align = align
+        return instrs
 
     def descr(self, buf):
         val, ptr = self.operands
@@ -470,17 +624,14 @@ class StoreInstr(Instruction):
             align = ', align %d' % (self.align)
         else:
             align = ''
-        buf.append("store {0} {1}, {2} {3}{4}{5}\n".format(
-            val.type,
-            val.get_reference(),
-            ptr.type,
-            ptr.get_reference(),
-            align,
-            self._stringify_metadata(leading_comma=True),
-        ))
+        buf += ('store ', str(val.type), ' ', val.get_reference(), ', ',
+                str(ptr.type), ' ', ptr.get_reference(), align,
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class LoadAtomicInstr(Instruction):
+    __slots__ = ('ordering', 'align')
+
     def __init__(self, parent, ptr, ordering, align, name='', typ=None):
         if typ is None:
             if isinstance(ptr, AllocaInstr):
@@ -509,6 +660,8 @@ class LoadAtomicInstr(Instruction):
 
 
 class StoreAtomicInstr(Instruction):
+    __slots__ = ('ordering', 'align')
+
     def __init__(self, parent, val, ptr, ordering, align):
         super(StoreAtomicInstr, self).__init__(parent, types.VoidType(),
                                                "store atomic", [val, ptr])
@@ -529,6 +682,8 @@ class StoreAtomicInstr(Instruction):
 
 
 class AllocaInstr(Instruction):
+    __slots__ = ('allocated_type', 'align')
+
     def __init__(self, parent, typ, count, name):
         operands = [count] if count else ()
         super(AllocaInstr, self).__init__(parent, typ.as_pointer(), "alloca",
@@ -537,22 +692,35 @@ class AllocaInstr(Instruction):
         self.align = None
 
     def descr(self, buf):
-        buf.append("{0} {1}".format(self.opname, self.allocated_type))
+        buf += (self.opname, ' ', str(self.allocated_type))
         if self.operands:
             op, = self.operands
-            buf.append(", {0} {1}".format(op.type, op.get_reference()))
+            buf += (', ', str(op.type), ' ', op.get_reference())
         if self.align is not None:
             buf.append(", align {0}".format(self.align))
-        if self.metadata:
+        if self._metadata:
             buf.append(self._stringify_metadata(leading_comma=True))
 
 
 class GEPInstr(Instruction):
+    __slots__ = ('source_etype', 'pointer', 'indices', 'inbounds')
+
     def __init__(self, parent, ptr, indices, inbounds, name,
                  source_etype=None):
+        typ, self.source_etype = self._get_types(ptr, indices, source_etype)
+        super(GEPInstr, self).__init__(parent, typ, "getelementptr",
+                                       [ptr] + list(indices), name=name)
+        self.pointer = ptr
+        self.indices = indices
+        self.inbounds = inbounds
+
+    @staticmethod
+    def _get_types(ptr, indices, source_etype):
+        """
+        Return the result type and the source element type of a GEP.
+        """
         if source_etype is not None:
-            typ = ptr.type
-            self.source_etype = source_etype
+            return ptr.type, source_etype
         # For compatibility with typed pointers. Eventually this should
         # probably be removed (when typed pointers are fully removed).
         elif not ptr.type.is_opaque:
@@ -570,56 +738,79 @@ class GEPInstr(Instruction):
                 typ = lasttyp
             else:
                 typ = typ.as_pointer(lastaddrspace)
-            self.source_etype = ptr.type.pointee
+            return typ, ptr.type.pointee
         else:
             raise ValueError("GEP lacks type.")
-        super(GEPInstr, self).__init__(parent, typ, "getelementptr",
-                                       [ptr] + list(indices), name=name)
-        self.pointer = ptr
-        self.indices = indices
-        self.inbounds = inbounds
+
+    @classmethod
+    def _create_geps(cls, parent, ptr, indices_list, inbounds, name='',
+                     source_etype=None):
+        """
+        Create a GEP of *ptr* with each sequence of indices of
+        *indices_list*, as the constructor would.
+        """
+        typed_operands = []
+        etypes = []
+        for indices in indices_list:
+            typ, etype = cls._get_types(ptr, indices, source_etype)
+            typed_operands.append((typ, [ptr] + list(indices)))
+            etypes.append(etype)
+        instrs = cls._new_many(parent, "getelementptr", typed_operands, name)
+        for instr, etype, indices in zip(instrs, etypes, indices_list):
+            instr.source_etype = etype
+            instr.pointer = ptr
+            instr.indices = indices
+            instr.inbounds = inbounds
+        return instrs
+
+    def replace_usage(self, old, new):
+        super(GEPInstr, self).replace_usage(old, new)
+        self.pointer = self.operands[0]
+        self.indices = self.operands[1:]
 
     def descr(self, buf):
-        indices = ['{0} {1}'.format(i.type, i.get_reference())
-                   for i in self.indices]
         op = "getelementptr inbounds" if self.inbounds else "getelementptr"
-        buf.append("{0} {1}, {2} {3}, {4} {5}\n".format(
-                   op,
-                   self.source_etype,
-                   self.pointer.type,
-                   self.pointer.get_reference(),
-                   ', '.join(indices),
-                   self._stringify_metadata(leading_comma=True),
-                   ))
+        buf += (op, ' ', str(self.source_etype), ', ',
+                str(self.pointer.type), ' ', self.pointer.get_reference(),
+                ', ', _format_operands(self.indices), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class PhiInstr(Instruction):
+    __slots__ = ('incomings',)
+
     def __init__(self, parent, typ, name, flags=()):
+        self.incomings = []
         super(PhiInstr, self).__init__(parent, typ, "phi", (), name=name,
                                        flags=flags)
-        self.incomings = []
 
     def descr(self, buf):
-        incs = ', '.join('[{0}, {1}]'.format(v.get_reference(),
-                                             b.get_reference())
-                         for v, b in self.incomings)
-        buf.append("phi {0} {1} {2} {3}\n".format(
-                   ' '.join(self.flags),
-                   self.type,
-                   incs,
-                   self._stringify_metadata(leading_comma=True),
-                   ))
+        incs = ', '.join(['[' + v.get_reference() + ', ' +
+                          b.get_reference() + ']'
+                          for v, b in self.incomings])
+        buf += ('phi ', ' '.join(self._flags or ()), ' ', str(self.type), ' ',
+                incs, ' ', self._stringify_metadata(leading_comma=True),
+                '\n')
+
+    def _get_used_values(self):
+        return [val for val, blk in self.incomings]
 
     def add_incoming(self, value, block):
         assert isinstance(block, Block)
         self.incomings.append((value, block))
+        self._clear_string_cache()
+        self._update_uses(value)
 
     def replace_usage(self, old, new):
         self.incomings = [((new if val is old else val), blk)
                           for (val, blk) in self.incomings]
+        self._clear_string_cache()
+        self._update_uses(old, new)
 
 
 class ExtractElement(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent, vector, index, name=''):
         if not isinstance(vector.type, types.VectorType):
             raise TypeError("vector needs to be of VectorType.")
@@ -630,13 +821,12 @@ class ExtractElement(Instruction):
                                              [vector, index], name=name)
 
     def descr(self, buf):
-        operands = ", ".join("{0} {1}".format(
-                   op.type, op.get_reference()) for op in self.operands)
-        buf.append("{opname} {operands}\n".format(
-                   opname=self.opname, operands=operands))
+        buf += (self.opname, ' ', _format_operands(self.operands), '\n')
 
 
 class InsertElement(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent, vector, value, index, name=''):
         if not isinstance(vector.type, types.VectorType):
             raise TypeError("vector needs to be of VectorType.")
@@ -651,13 +841,12 @@ class InsertElement(Instruction):
                                             [vector, value, index], name=name)
 
     def descr(self, buf):
-        operands = ", ".join("{0} {1}".format(
-                   op.type, op.get_reference()) for op in self.operands)
-        buf.append("{opname} {operands}\n".format(
-                   opname=self.opname, operands=operands))
+        buf += (self.opname, ' ', _format_operands(self.operands), '\n')
 
 
 class ShuffleVector(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent, vector1, vector2, mask, name=''):
         if not isinstance(vector1.type, types.VectorType):
             raise TypeError("vector1 needs to be of VectorType.")
@@ -674,7 +863,11 @@ class ShuffleVector(Instruction):
         index_range = range(vector1.type.count
                             if vector2 == Undefined
                             else 2 * vector1.type.count)
-        if not all(ii.constant in index_range for ii in mask.constant):
+        if isinstance(mask.constant, array.array):
+            indices = mask.constant
+        else:
+            indices = [ii.constant for ii in mask.constant]
+        if not all(ii in index_range for ii in indices):
             raise IndexError(
                 "mask values need to be in {0}".format(index_range),
             )
@@ -682,14 +875,13 @@ class ShuffleVector(Instruction):
                                             [vector1, vector2, mask], name=name)
 
     def descr(self, buf):
-        buf.append("shufflevector {0} {1}\n".format(
-                   ", ".join("{0} {1}".format(op.type, op.get_reference())
-                             for op in self.operands),
-                   self._stringify_metadata(leading_comma=True),
-                   ))
+        buf += ('shufflevector ', _format_operands(self.operands), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class ExtractValue(Instruction):
+    __slots__ = ('aggregate', 'indices')
+
     def __init__(self, parent, agg, indices, name=''):
         typ = agg.type
         try:
@@ -705,18 +897,20 @@ class ExtractValue(Instruction):
         self.aggregate = agg
         self.indices = indices
 
+    def replace_usage(self, old, new):
+        super(ExtractValue, self).replace_usage(old, new)
+        self.aggregate, = self.operands
+
     def descr(self, buf):
         indices = [str(i) for i in self.indices]
-
-        buf.append("extractvalue {0} {1}, {2} {3}\n".format(
-                   self.aggregate.type,
-                   self.aggregate.get_reference(),
-                   ', '.join(indices),
-                   self._stringify_metadata(leading_comma=True),
-                   ))
+        buf += ('extractvalue ', str(self.aggregate.type), ' ',
+                self.aggregate.get_reference(), ', ', ', '.join(indices), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class InsertValue(Instruction):
+    __slots__ = ('aggregate', 'value', 'indices')
+
     def __init__(self, parent, agg, elem, indices, name=''):
         typ = agg.type
         try:
@@ -735,18 +929,21 @@ class InsertValue(Instruction):
         self.value = elem
         self.indices = indices
 
+    def replace_usage(self, old, new):
+        super(InsertValue, self).replace_usage(old, new)
+        self.aggregate, self.value = self.operands
+
     def descr(self, buf):
         indices = [str(i) for i in self.indices]
-
-        buf.append("insertvalue {0} {1}, {2} {3}, {4} {5}\n".format(
-                   self.aggregate.type, self.aggregate.get_reference(),
-                   self.value.type, self.value.get_reference(),
-                   ', '.join(indices),
-                   self._stringify_metadata(leading_comma=True),
-                   ))
+        buf += ('insertvalue ', str(self.aggregate.type), ' ',
+                self.aggregate.get_reference(), ', ', str(self.value.type), ' ',
+                self.value.get_reference(), ', ', ', '.join(indices), ' ',
+                self._stringify_metadata(leading_comma=True), '\n')
 
 
 class Unreachable(Instruction):
+    __slots__ = ()
+
     def __init__(self, parent):
         super(Unreachable, self).__init__(parent, types.VoidType(),
                                           "unreachable", (), name='')
@@ -779,6 +976,8 @@ class InlineAsm(object):
 
 
 class AtomicRMW(Instruction):
+    __slots__ = ('operation', 'ordering')
+
     def __init__(self, parent, op, ptr, val, ordering, name):
         super(AtomicRMW, self).__init__(parent, val.type, "atomicrmw",
                                         (ptr, val), name=name)
@@ -804,6 +1003,7 @@ class CmpXchg(Instruction):
     """This instruction has changed since llvm3.5.  It is not compatible with
     older llvm versions.
     """
+    __slots__ = ('ordering', 'failordering')
 
     def __init__(self, parent, ptr, cmp, val, ordering, failordering, name):
         outtype = types.LiteralStructType([val.type, types.IntType(1)])
@@ -853,6 +1053,8 @@ class FilterClause(_LandingPadClause):
 
 
 class LandingPadInstr(Instruction):
+    __slots__ = ('cleanup', 'clauses')
+
     def __init__(self, parent, typ, name='', cleanup=False):
         super(LandingPadInstr, self).__init__(parent, typ, "landingpad", [],
                                               name=name)
@@ -862,6 +1064,7 @@ class LandingPadInstr(Instruction):
     def add_clause(self, clause):
         assert isinstance(clause, _LandingPadClause)
         self.clauses.append(clause)
+        self._clear_string_cache()
 
     def descr(self, buf):
         fmt = "landingpad {type}{cleanup}{clauses}\n"
@@ -880,6 +1083,7 @@ class Fence(Instruction):
 
     fence [syncscope("<target-scope>")] <ordering>  ; yields void
     """
+    __slots__ = ('ordering', 'targetscope')
 
     VALID_FENCE_ORDERINGS = {"acquire", "release", "acq_rel", "seq_cst"}
 
@@ -909,6 +1113,7 @@ class Comment(Instruction):
     """
     A line comment.
     """
+    __slots__ = ('text',)
 
     def __init__(self, parent, text):
         super(Comment, self).__init__(parent, types.VoidType(), ";", (),
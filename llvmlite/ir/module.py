@@ -1,6 +1,14 @@
 import collections
+import concurrent.futures
+import functools
+import gc
+import io
+import multiprocessing
+import re
+import sys
+import threading
 
-from llvmlite.ir import context, values, types, _utils
+from llvmlite.ir import context, instructions, values, types, _utils
 
 
 class Module(object):
@@ -17,6 +25,9 @@ class Module(object):
         self.namedmetadata = {}
         # Cache for metadata node deduplication
         self._metadatacache = {}
+        self._track_uses = False
+        # Whether to only declare the identified types used by the module
+        self.only_used_identified_types = False
 
     def _fix_metadata_operands(self, operands):
         fixed_ops = []
@@ -132,6 +143,36 @@ class Module(object):
         return [v for v in self.globals.values()
                 if isinstance(v, values.Function)]
 
+    @property
+    def track_uses(self):
+        """
+        Whether the users of values are tracked as instructions are
+        created and modified, making the *users* attribute and
+        replace_all_uses_with() method of values proportional to the
+        number of uses instead of the module size.  Enabling it computes
+        the uses of the existing instructions.
+        """
+        return self._track_uses
+
+    @track_uses.setter
+    def track_uses(self, enable):
+        enable = bool(enable)
+        if enable == self._track_uses:
+            return
+        for instr in self._iter_instructions():
+            if enable:
+                instr._add_uses()
+            else:
+                for value in instr._get_used_values():
+                    if isinstance(value, values.NamedValue):
+                        value._users = None
+        self._track_uses = enable
+
+    def _iter_instructions(self):
+        for func in self.functions:
+            for block in func.blocks:
+                yield from block.instructions
+
     @property
     def global_values(self):
         """
@@ -212,25 +253,63 @@ class Module(object):
         return values.Function(self, fnty, name=name)
 
     def get_identified_types(self):
-        return self.context.identified_types
+        return self.context.get_all_identified_types()
 
-    def _get_body_lines(self):
+    def get_used_identified_types(self):
+        """
+        Return a dict of the identified types (by name) used by the global
+        values and metadata of this module, directly or through other
+        types, in the order they were created in the context.
+        """
+        collector = _TypeCollector(self.get_identified_types())
+        for gv in self.globals.values():
+            collector.visit_global(gv)
+        for nmd in self.namedmetadata.values():
+            for md in nmd.operands:
+                collector.visit_value(md)
+        for md in self.metadata:
+            collector.visit_value(md)
+        used = collector.identified
+        return {name: ty for name, ty in self.get_identified_types().items()
+                if name in used}
+
+    def _iter_body_lines(self, global_lines=None):
         # Type declarations
-        lines = [it.get_declaration()
-                 for it in self.get_identified_types().values()]
+        if self.only_used_identified_types:
+            idtypes = self.get_used_identified_types()
+        else:
+            idtypes = self.get_identified_types()
+        for it in idtypes.values():
+            yield it.get_declaration()
         # Global values (including function definitions)
-        lines += [str(v) for v in self.globals.values()]
-        return lines
+        if global_lines is None:
+            global_lines = (str(v) for v in self.globals.values())
+        yield from global_lines
 
-    def _get_metadata_lines(self):
-        mdbuf = []
+    def _iter_metadata_lines(self):
         for k, v in self.namedmetadata.items():
-            mdbuf.append("!{name} = !{{ {operands} }}".format(
+            yield "!{name} = !{{ {operands} }}".format(
                 name=k, operands=', '.join(i.get_reference()
-                                           for i in v.operands)))
+                                           for i in v.operands))
         for md in self.metadata:
-            mdbuf.append(str(md))
-        return mdbuf
+            yield str(md)
+
+    def _iter_lines(self, global_lines=None):
+        # Header
+        yield '; ModuleID = "%s"' % (self.name,)
+        yield 'target triple = "%s"' % (self.triple,)
+        yield 'target datalayout = "%s"' % (self.data_layout,)
+        yield ''
+        # Body
+        yield from self._iter_body_lines(global_lines)
+        # Metadata
+        yield from self._iter_metadata_lines()
+
+    def _get_body_lines(self):
+        return list(self._iter_body_lines())
+
+    def _get_metadata_lines(self):
+        return list(self._iter_metadata_lines())
 
     def _stringify_body(self):
         # For testing
@@ -240,17 +319,195 @@ class Module(object):
         # For testing
         return "\n".join(self._get_metadata_lines())
 
+    def iter_text_chunks(self):
+        """
+        Generate the textual IR of this module as a sequence of string
+        chunks.  Joining the chunks gives the same result as ``str(module)``,
+        but only one global value (e.g. one function) is formatted at a time.
+        """
+        lines = self._iter_lines()
+        yield next(lines)
+        for line in lines:
+            yield "\n"
+            yield line
+
+    def to_string(self, workers=None):
+        """
+        Return the textual IR of this module, identical to ``str(module)``.
+
+        If *workers* is greater than 1, the global values (e.g. function
+        definitions) are formatted in parallel by that many workers: forked
+        processes where it is safe (see _can_fork()), otherwise threads.
+        Threads only give a speed-up on a free-threaded Python build.
+        """
+        gvs = list(self.globals.values())
+        if workers is None or workers <= 1 or len(gvs) < 2:
+            return repr(self)
+        # Several contiguous chunks per worker to balance the load
+        nchunks = min(len(gvs), workers * 4)
+        bounds = [len(gvs) * i // nchunks for i in range(nchunks + 1)]
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+        if getattr(sys, '_is_gil_enabled', lambda: True)() and _can_fork():
+            # The forked workers inherit the module, only the formatted
+            # text is sent back
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_forked_worker, initargs=(gvs,))
+            func = _format_forked_global_values
+        else:
+            pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            func = functools.partial(_format_global_values, gvs)
+        with pool:
+            results = pool.map(func, chunks)
+            global_lines = [line for lines in results for line in lines]
+        return "\n".join(self._iter_lines(global_lines))
+
+    def write_to(self, fileobj):
+        """
+        Write the textual IR of this module to *fileobj*, a text or binary
+        file-like object.  Binary streams receive UTF-8 encoded bytes.
+        The module text is never joined into a single string, although
+        the text of each global value and basic block is cached on it.
+        """
+        mode = getattr(fileobj, 'mode', '')
+        if (isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)) or
+                (isinstance(mode, str) and 'b' in mode)):
+            for chunk in self.iter_text_chunks():
+                fileobj.write(chunk.encode('utf8'))
+        else:
+            for chunk in self.iter_text_chunks():
+                fileobj.write(chunk)
+
     def __repr__(self):
-        lines = []
-        # Header
-        lines += [
-            '; ModuleID = "%s"' % (self.name,),
-            'target triple = "%s"' % (self.triple,),
-            'target datalayout = "%s"' % (self.data_layout,),
-            '']
-        # Body
-        lines += self._get_body_lines()
-        # Metadata
-        lines += self._get_metadata_lines()
+        return "".join(self.iter_text_chunks())
+
+
+class _TypeCollector(object):
+    """
+    Collect the names of the identified types reachable from values.
+    """
+
+    # The references to identified types in formatted constants
+    _type_ref_re = re.compile(r'%"[^"]*"')
+
+    def __init__(self, identified_types):
+        self._identified_types = identified_types
+        self._types_by_ref = None
+        self.identified = set()
+        # Visited types and values, by id since identified struct
+        # types all have the same hash
+        self._seen = set()
+
+    def visit_type(self, ty):
+        stack = [ty]
+        seen = self._seen
+        while stack:
+            ty = stack.pop()
+            if id(ty) in seen:
+                continue
+            seen.add(id(ty))
+            if isinstance(ty, types.IdentifiedStructType):
+                self.identified.add(ty.name)
+            if isinstance(ty, types.BaseStructType):
+                stack.extend(ty.elements or ())
+            elif isinstance(ty, (types.ArrayType, types.VectorType)):
+                stack.append(ty.element)
+            elif isinstance(ty, types.FunctionType):
+                stack.append(ty.return_type)
+                stack.extend(ty.args)
+            elif isinstance(ty, types.PointerType) and not ty.is_opaque:
+                stack.append(ty.pointee)
+
+    def visit_value(self, value):
+        stack = [value]
+        seen = self._seen
+        while stack:
+            value = stack.pop()
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            ty = getattr(value, 'type', None)
+            if isinstance(ty, types.Type):
+                self.visit_type(ty)
+            if isinstance(value, values.FormattedConstant):
+                # The operands were formatted away, look for type
+                # references in the text
+                self._visit_text(value.constant)
+            elif isinstance(value, values.Constant):
+                if isinstance(value.constant, (list, tuple)):
+                    stack.extend(value.constant)
+            elif isinstance(value, values.MDValue):
+                stack.extend(value.operands)
+            elif isinstance(value, values.MetaDataArgument):
+                stack.append(value.wrapped_value)
+
+    def _visit_text(self, text):
+        if self._types_by_ref is None:
+            self._types_by_ref = {str(ty): ty for ty in
+                                  self._identified_types.values()}
+        for ref in self._type_ref_re.findall(text):
+            ty = self._types_by_ref.get(ref)
+            if ty is not None:
+                self.visit_type(ty)
+
+    def visit_global(self, gv):
+        self.visit_type(gv.type)
+        if isinstance(gv, values.GlobalVariable):
+            self.visit_type(gv.value_type)
+            if gv.initializer is not None:
+                self.visit_value(gv.initializer)
+        elif isinstance(gv, values.Function):
+            self.visit_type(gv.ftype)
+            for blk in gv.blocks:
+                for instr in blk.instructions:
+                    self.visit_instruction(instr)
+
+    def visit_instruction(self, instr):
+        self.visit_type(instr.type)
+        for value in instr._get_used_values():
+            self.visit_value(value)
+        if isinstance(instr, instructions.CallInstr):
+            self.visit_type(instr.callee.function_type)
+        elif isinstance(instr, instructions.AllocaInstr):
+            self.visit_type(instr.allocated_type)
+        elif isinstance(instr, instructions.GEPInstr):
+            self.visit_type(instr.source_etype)
+        elif isinstance(instr, instructions.SwitchInstr):
+            for value, blk in instr.cases:
+                self.visit_value(value)
+        elif isinstance(instr, instructions.LandingPadInstr):
+            for clause in instr.clauses:
+                self.visit_value(clause.value)
+
+
+def _format_global_values(gvs, bounds):
+    start, stop = bounds
+    return [str(v) for v in gvs[start:stop]]
+
+
+def _can_fork():
+    """
+    Whether to_string() may fork worker processes.  Forking a process
+    running other threads can deadlock the child on a lock held by one
+    of them.  The workers only run Python code formatting the module,
+    and never call into LLVM.
+    """
+    return ('fork' in multiprocessing.get_all_start_methods() and
+            threading.active_count() == 1)
+
+
+# The global values inherited by a forked to_string() worker
+_forked_values = None
+
+
+def _init_forked_worker(gvs):
+    global _forked_values
+    _forked_values = gvs
+    # Don't let the garbage collector dispose of LLVM objects inherited
+    # from the parent
+    gc.disable()
+
 
-        return "\n".join(lines)
+def _format_forked_global_values(bounds):
+    return _format_global_values(_forked_values, bounds)
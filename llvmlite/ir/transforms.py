@@ -59,6 +59,14 @@ def replace_all_calls(mod, orig, repl):
     """Replace all calls to `orig` to `repl` in module `mod`.
     Returns the references to the returned calls
     """
+    if mod.track_uses:
+        # Only look at the instructions using `orig`
+        calls = []
+        for instr in list(orig._users or ()):
+            if isinstance(instr, CallInstr) and instr.callee == orig:
+                instr.replace_callee(repl)
+                calls.append(instr)
+        return calls
     rc = ReplaceCalls(orig, repl)
     rc.visit(mod)
     return rc.calls
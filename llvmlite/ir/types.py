@@ -2,7 +2,10 @@
 Classes that are LLVM types
 """
 
+import array
 import struct
+import sys
+import weakref
 
 from llvmlite import ir_layer_typed_pointers_enabled
 from llvmlite.ir._utils import _StrCaching
@@ -12,6 +15,23 @@ def _wrapname(x):
     return '"{0}"'.format(x.replace('\\', '\\5c').replace('"', '\\22'))
 
 
+# Structurally equal types are interned, so that they are the same object
+# and their string representation is computed only once.  Types are keyed
+# on the identity of the types they are made of, which are interned too
+# (or, for identified struct types, unique in their context).
+_interned_types = weakref.WeakValueDictionary()
+
+
+def _intern_type(key, ty, hashkey):
+    """
+    Register the newly created type *ty* under *key* and return it.
+    *hashkey* is the structural key used to compute its hash.
+    """
+    ty._hash = hash(hashkey)
+    # Another thread may have interned an equal type in the meantime
+    return _interned_types.setdefault(key, ty)
+
+
 class Type(_StrCaching):
     """
     The base class for all LLVM types.
@@ -29,6 +49,8 @@ class Type(_StrCaching):
         return PointerType(self, addrspace)
 
     def __ne__(self, other):
+        if self is other:
+            return False
         return not (self == other)
 
     def _get_ll_global_value_type(self, target_data, context=None):
@@ -89,6 +111,17 @@ class Type(_StrCaching):
 
 class MetaDataType(Type):
 
+    def __new__(cls):
+        key = (cls,)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            return _intern_type(key, super(MetaDataType, cls).__new__(cls),
+                                key)
+
+    def __reduce__(self):
+        return type(self), ()
+
     def _to_string(self):
         return "metadata"
 
@@ -99,7 +132,7 @@ class MetaDataType(Type):
         return isinstance(other, MetaDataType)
 
     def __hash__(self):
-        return hash(MetaDataType)
+        return self._hash
 
 
 class LabelType(Type):
@@ -124,12 +157,18 @@ class PointerType(Type):
     def __new__(cls, pointee=None, addrspace=0):
         if cls is PointerType and pointee is not None and \
            type(pointee) is not PointerType:
-            return super().__new__(_TypedPointerType)
-        return super(PointerType, cls).__new__(cls)
-
-    def __init__(self, pointee=None, addrspace=0):
+            return _TypedPointerType(pointee, addrspace)
         assert pointee is None or type(pointee) is PointerType
-        self.addrspace = addrspace
+        key = (cls, addrspace)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            self = super(PointerType, cls).__new__(cls)
+            self.addrspace = addrspace
+            return _intern_type(key, self, (PointerType, addrspace))
+
+    def __reduce__(self):
+        return type(self), (None, self.addrspace)
 
     def _to_string(self):
         if self.addrspace != 0:
@@ -138,11 +177,15 @@ class PointerType(Type):
             return "ptr"
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, PointerType) and
                 self.addrspace == other.addrspace)
 
     def __hash__(self):
-        return hash(PointerType)
+        # Typed and opaque pointers can compare equal (see
+        # _TypedPointerType.__eq__), so only the address space is hashed.
+        return self._hash
 
     @property
     def intrinsic_name(self):
@@ -160,13 +203,22 @@ class _TypedPointerType(PointerType):
     """
     The type of typed pointer values. To be removed eventually.
     """
+    is_opaque = False
 
-    def __init__(self, pointee, addrspace=0):
-        super(_TypedPointerType, self).__init__(None, addrspace)
+    def __new__(cls, pointee, addrspace=0):
         assert pointee is not None and type(pointee) is not PointerType
         assert not isinstance(pointee, VoidType)
-        self.pointee = pointee
-        self.is_opaque = False
+        key = (cls, id(pointee), addrspace)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            self = Type.__new__(cls)
+            self.pointee = pointee
+            self.addrspace = addrspace
+            return _intern_type(key, self, (PointerType, addrspace))
+
+    def __reduce__(self):
+        return type(self), (self.pointee, self.addrspace)
 
     def _to_string(self):
         if ir_layer_typed_pointers_enabled:
@@ -176,6 +228,8 @@ class _TypedPointerType(PointerType):
 
     # This implements ``isOpaqueOrPointeeTypeEquals''.
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, _TypedPointerType):
             return (self.pointee, self.addrspace) == (other.pointee,
                                                       other.addrspace)
@@ -183,7 +237,7 @@ class _TypedPointerType(PointerType):
                 self.addrspace == other.addrspace)
 
     def __hash__(self):
-        return hash(_TypedPointerType)
+        return self._hash
 
     def gep(self, i):
         """
@@ -205,6 +259,16 @@ class VoidType(Type):
     The type for empty values (e.g. a function returning no value).
     """
 
+    def __new__(cls):
+        key = (cls,)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            return _intern_type(key, super(VoidType, cls).__new__(cls), key)
+
+    def __reduce__(self):
+        return type(self), ()
+
     def _to_string(self):
         return 'void'
 
@@ -212,7 +276,7 @@ class VoidType(Type):
         return isinstance(other, VoidType)
 
     def __hash__(self):
-        return hash(VoidType)
+        return self._hash
 
     @classmethod
     def from_llvm(cls, typeref, ir_ctx):
@@ -227,10 +291,21 @@ class FunctionType(Type):
     The type for functions.
     """
 
-    def __init__(self, return_type, args, var_arg=False):
-        self.return_type = return_type
-        self.args = tuple(args)
-        self.var_arg = var_arg
+    def __new__(cls, return_type, args, var_arg=False):
+        args = tuple(args)
+        key = (cls, id(return_type), tuple(map(id, args)), var_arg)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            self = super(FunctionType, cls).__new__(cls)
+            self.return_type = return_type
+            self.args = args
+            self.var_arg = var_arg
+            return _intern_type(key, self,
+                                (FunctionType, return_type, args, var_arg))
+
+    def __reduce__(self):
+        return type(self), (self.return_type, self.args, self.var_arg)
 
     def _to_string(self):
         if self.args:
@@ -245,6 +320,8 @@ class FunctionType(Type):
             return '{0} ()'.format(self.return_type)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, FunctionType):
             return (self.return_type == other.return_type and
                     self.args == other.args and self.var_arg == other.var_arg)
@@ -252,7 +329,7 @@ class FunctionType(Type):
             return False
 
     def __hash__(self):
-        return hash(FunctionType)
+        return self._hash
 
     @classmethod
     def from_llvm(cls, typeref, ir_ctx):
@@ -282,7 +359,13 @@ class IntType(Type):
             except KeyError:
                 inst = cls._instance_cache[bits] = cls.__new(bits)
                 return inst
-        return cls.__new(bits)
+        # Other widths are interned for as long as they are in use
+        key = (cls, bits)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            inst = cls.__new(bits)
+            return _intern_type(key, inst, key)
 
     @classmethod
     def __new(cls, bits):
@@ -394,6 +477,7 @@ class HalfType(_BaseFloatType):
     """
     null = '0.0'
     intrinsic_name = 'f16'
+    _packfmt = 'e'
 
     def __str__(self):
         return 'half'
@@ -408,6 +492,7 @@ class FloatType(_BaseFloatType):
     """
     null = '0.0'
     intrinsic_name = 'f32'
+    _packfmt = 'f'
 
     def __str__(self):
         return 'float'
@@ -422,6 +507,7 @@ class DoubleType(_BaseFloatType):
     """
     null = '0.0'
     intrinsic_name = 'f64'
+    _packfmt = 'd'
 
     def __str__(self):
         return 'double'
@@ -449,14 +535,103 @@ class _Repeat(object):
             raise IndexError(item)
 
 
+# Array typecodes used to store the items of buffer-backed constants,
+# keyed on the kind of items ('i'nteger, 'u'nsigned or 'f'loat) and
+# their size in bytes.
+_array_typecodes = {}
+for _code in 'bhiqBHIQfd':
+    _kind = 'f' if _code in 'fd' else 'u' if _code.isupper() else 'i'
+    _array_typecodes[_kind, array.array(_code).itemsize] = _code
+
+
+def _buffer_kind(code):
+    if code in 'efd':
+        return 'f'
+    elif code in 'BHILQN?':
+        return 'u'
+    elif code in 'bhilqn':
+        return 'i'
+    return None
+
+
+def _wrap_buffer(element, value):
+    """
+    Copy the items of *value*, an object supporting the buffer protocol
+    (e.g. a NumPy array), into an array.array holding constants of the
+    *element* type.  None is returned if *value* is not such an object,
+    or is a 0-d buffer (e.g. a NumPy scalar), which stands for a single
+    value.
+    """
+    try:
+        buf = memoryview(value)
+    except TypeError:
+        return None
+    if buf.ndim == 0:
+        return None
+    fmt = buf.format
+    code = fmt.lstrip('@=<>!')
+    kind = _buffer_kind(code) if len(code) == 1 else None
+    itemsize = buf.itemsize
+    if kind is None:
+        ok = False
+    elif isinstance(element, IntType):
+        ok = kind != 'f' and (itemsize * 8 == element.width or
+                              code == '?' and element.width == 1)
+    elif isinstance(element, _BaseFloatType):
+        ok = kind == 'f' and itemsize == struct.calcsize(element._packfmt)
+    else:
+        ok = False
+    if not ok:
+        raise TypeError("cannot create %s constants from a buffer of "
+                        "format %r" % (element, fmt))
+    if kind == 'f' and itemsize == 2:
+        # No array typecode for half floats, store their bits instead
+        kind = 'u'
+    data = array.array(_array_typecodes[kind, itemsize])
+    data.frombytes(buf.tobytes())
+    if fmt[0] in '<>!' and (fmt[0] == '<') != (sys.byteorder == 'little'):
+        data.byteswap()
+    return data
+
+
+def _buffer_element_values(element, data):
+    """
+    Return the items of *data*, as returned by _wrap_buffer(), as Python
+    ints for integer *element* types or as formatted floating-point
+    constants otherwise.
+    """
+    if isinstance(element, IntType):
+        return data.tolist()
+    if isinstance(element, HalfType):
+        data = array.array('d', struct.unpack('%de' % len(data), data))
+    elif isinstance(element, FloatType):
+        data = array.array('d', data)
+    raw = memoryview(data).cast('B').cast('Q')
+    return ['%#16x' % v for v in raw.tolist()]
+
+
+def _format_buffer_elements(element, data):
+    fmt = '%s %%s' % (element,)
+    return ", ".join(map(fmt.__mod__, _buffer_element_values(element, data)))
+
+
 class VectorType(Type):
     """
     The type for vectors of primitive data items (e.g. "<f32 x 4>").
     """
 
-    def __init__(self, element, count):
-        self.element = element
-        self.count = count
+    def __new__(cls, element, count):
+        key = (cls, id(element), count)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            self = super(VectorType, cls).__new__(cls)
+            self.element = element
+            self.count = count
+            return _intern_type(key, self, (VectorType, element, count))
+
+    def __reduce__(self):
+        return type(self), (self.element, self.count)
 
     @property
     def elements(self):
@@ -469,17 +644,18 @@ class VectorType(Type):
         return "<%d x %s>" % (self.count, self.element)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, VectorType):
             return self.element == other.element and self.count == other.count
 
     def __hash__(self):
-        # TODO: why does this not take self.element/self.count into account?
-        return hash(VectorType)
-
-    def __copy__(self):
-        return self
+        return self._hash
 
     def format_constant(self, value):
+        if isinstance(value, array.array):
+            return "<{0}>".format(_format_buffer_elements(self.element,
+                                                          value))
         itemstring = ", " .join(["{0} {1}".format(x.type, x.get_reference())
                                  for x in value])
         return "<{0}>".format(itemstring)
@@ -487,6 +663,12 @@ class VectorType(Type):
     def wrap_constant_value(self, values):
         from . import Value, Constant
         if not isinstance(values, (list, tuple)):
+            data = _wrap_buffer(self.element, values)
+            if data is not None:
+                if len(data) != len(self):
+                    raise ValueError("wrong constant size for %s: got %d "
+                                     "elements" % (self, len(data)))
+                return data
             if isinstance(values, Constant):
                 if values.type != self.element:
                     raise TypeError("expected {} for {}".format(
@@ -533,9 +715,18 @@ class ArrayType(Aggregate):
     The type for fixed-size homogenous arrays (e.g. "[f32 x 3]").
     """
 
-    def __init__(self, element, count):
-        self.element = element
-        self.count = count
+    def __new__(cls, element, count):
+        key = (cls, id(element), count)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            self = super(ArrayType, cls).__new__(cls)
+            self.element = element
+            self.count = count
+            return _intern_type(key, self, (ArrayType, element, count))
+
+    def __reduce__(self):
+        return type(self), (self.element, self.count)
 
     @property
     def elements(self):
@@ -548,11 +739,13 @@ class ArrayType(Aggregate):
         return "[%d x %s]" % (self.count, self.element)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, ArrayType):
             return self.element == other.element and self.count == other.count
 
     def __hash__(self):
-        return hash(ArrayType)
+        return self._hash
 
     def gep(self, i):
         """
@@ -562,7 +755,24 @@ class ArrayType(Aggregate):
             raise TypeError(i.type)
         return self.element
 
+    def wrap_constant_value(self, values):
+        if not isinstance(values, (list, tuple, bytearray)):
+            data = _wrap_buffer(self.element, values)
+            if data is not None:
+                if len(data) != len(self):
+                    raise ValueError("wrong constant size for %s: got %d "
+                                     "elements" % (self, len(data)))
+                if isinstance(self.element, IntType) and \
+                        self.element.width == 8:
+                    # Emitted as a c"..." string
+                    return bytearray(data)
+                return data
+        return super(ArrayType, self).wrap_constant_value(values)
+
     def format_constant(self, value):
+        if isinstance(value, array.array):
+            return "[{0}]".format(_format_buffer_elements(self.element,
+                                                          value))
         itemstring = ", " .join(["{0} {1}".format(x.type, x.get_reference())
                                  for x in value])
         return "[{0}]".format(itemstring)
@@ -661,24 +871,47 @@ class LiteralStructType(BaseStructType):
 
     null = 'zeroinitializer'
 
-    def __init__(self, elems, packed=False):
+    def __new__(cls, elems, packed=False):
         """
         *elems* is a sequence of types to be used as members.
         *packed* controls the use of packed layout.
         """
-        self.elements = tuple(elems)
-        self.packed = packed
+        elems = tuple(elems)
+        packed = bool(packed)
+        key = (cls, tuple(map(id, elems)), packed)
+        try:
+            return _interned_types[key]
+        except KeyError:
+            self = super(LiteralStructType, cls).__new__(cls)
+            self.elements = elems
+            self._packed = packed
+            return _intern_type(key, self,
+                                (LiteralStructType, elems, packed))
+
+    def __reduce__(self):
+        return type(self), (self.elements, self.packed)
+
+    @property
+    def packed(self):
+        """
+        A boolean attribute that indicates whether the structure uses
+        packed layout.  Literal struct types are interned, so it can't
+        be changed after creation.
+        """
+        return self._packed
 
     def _to_string(self):
         return self.structure_repr()
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, LiteralStructType):
             return (self.elements == other.elements
                     and self.packed == other.packed)
 
     def __hash__(self):
-        return hash(LiteralStructType)
+        return self._hash
 
 
 class IdentifiedStructType(BaseStructType):
@@ -3,7 +3,9 @@ Classes that are LLVM values: Value, Constant...
 Instructions are in the instructions module.
 """
 
+import array
 import functools
+import numbers
 import string
 import re
 from types import MappingProxyType
@@ -28,7 +30,20 @@ _CMP_MAP = {
 }
 
 
-def _escape_string(text, _map={}):
+# Bytes that can appear unescaped in a LLVM string constant
+_VALID_BYTES = bytes(sorted(_VALID_CHARS))
+
+# The escaped form of each byte, and a regex splitting a bytestring
+# around the bytes that need escaping
+_ESCAPED_CHARS = [chr(ch) if ch in _VALID_CHARS else '\\%02x' % ch
+                  for ch in range(256)]
+_ESCAPED_BYTES = {bytes([ch]): b'\\%02x' % ch for ch in range(256)
+                  if ch not in _VALID_CHARS}
+_ESCAPE_SPLIT_RE = re.compile(b'([%s])' % b''.join(
+    re.escape(ch) for ch in _ESCAPED_BYTES))
+
+
+def _escape_string(text):
     """
     Escape the given bytestring for safe use as a LLVM array constant.
     Any unicode string input is first encoded with utf8 into bytes.
@@ -37,15 +52,16 @@ def _escape_string(text, _map={}):
         text = text.encode()
     assert isinstance(text, (bytes, bytearray))
 
-    if not _map:
-        for ch in range(256):
-            if ch in _VALID_CHARS:
-                _map[ch] = chr(ch)
-            else:
-                _map[ch] = '\\%02x' % ch
-
-    buf = [_map[ch] for ch in text]
-    return ''.join(buf)
+    # Deleting the valid bytes leaves only those needing escaping
+    invalid = text.translate(None, _VALID_BYTES)
+    if not invalid:
+        return text.decode('ascii')
+    if len(invalid) * 10 < len(text):
+        # Few escapes: copy the runs of valid bytes as a whole
+        parts = _ESCAPE_SPLIT_RE.split(text)
+        parts[1::2] = map(_ESCAPED_BYTES.__getitem__, parts[1::2])
+        return b''.join(parts).decode('ascii')
+    return ''.join(map(_ESCAPED_CHARS.__getitem__, text))
 
 
 def _binop(opname):
@@ -418,6 +434,7 @@ class Value(object):
     """
     The base class for all values.
     """
+    __slots__ = ()
 
     def __repr__(self):
         return "<ir.%s type='%s' ...>" % (self.__class__.__name__, self.type,)
@@ -495,9 +512,43 @@ class Constant(_StrCaching, _StringReferenceCaching, _ConstOpMixin, Value):
             raise TypeError("Only pointer constant have address spaces")
         return self.type.addrspace
 
+    def _get_key(self):
+        """
+        Return a key identifying this constant: two constants have equal
+        keys if and only if they have the same textual form.  The key is
+        computed once, without formatting aggregate constants.
+        """
+        try:
+            return self.__key
+        except AttributeError:
+            pass
+        constant = self.constant
+        if constant is None or constant is Undefined:
+            ckey = constant
+        elif isinstance(self.type, types.IntType) and \
+                isinstance(constant, numbers.Integral) and \
+                not isinstance(constant, bool):
+            ckey = int(constant)
+        elif isinstance(constant, bytearray):
+            ckey = bytes(constant)
+        elif isinstance(constant, (list, tuple)):
+            ckey = tuple([_constant_element_key(el) for el in constant])
+        elif isinstance(constant, array.array):
+            element = self.type.element
+            tystr = str(element)
+            ckey = tuple([(tystr, v) for v in
+                          types._buffer_element_values(element, constant)])
+        else:
+            # Other scalars, e.g. floating-point values
+            ckey = self.type.format_constant(constant)
+        key = self.__key = (str(self.type), ckey)
+        return key
+
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, Constant):
-            return str(self) == str(other)
+            return self._get_key() == other._get_key()
         else:
             return False
 
@@ -505,12 +556,22 @@ class Constant(_StrCaching, _StringReferenceCaching, _ConstOpMixin, Value):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(str(self))
+        try:
+            return self.__hash
+        except AttributeError:
+            h = self.__hash = hash(self._get_key())
+            return h
 
     def __repr__(self):
         return "<ir.Constant type='%s' value=%r>" % (self.type, self.constant)
 
 
+def _constant_element_key(value):
+    if isinstance(value, Constant):
+        return value._get_key()
+    return (str(value.type), value.get_reference())
+
+
 class FormattedConstant(Constant):
     """
     A constant with an already formatted IR representation.
@@ -526,6 +587,9 @@ class FormattedConstant(Constant):
     def _get_reference(self):
         return self.constant
 
+    def _get_key(self):
+        return (None, self.constant)
+
 
 class NamedValue(_StrCaching, _StringReferenceCaching, Value):
     """
@@ -534,17 +598,31 @@ class NamedValue(_StrCaching, _StringReferenceCaching, Value):
     name_prefix = '%'
     deduplicate_name = True
 
+    # Slots keep the attributes of the most numerous values (instructions
+    # and blocks) out of the instance dict.  The dict is only allocated
+    # when an ad-hoc attribute is set, which user code may still do, and
+    # values can still be weakly referenced.
+    __slots__ = ('__dict__', '__weakref__', 'parent', 'type', '_name',
+                 '_users', '_StrCaching__cached_str',
+                 '_StringReferenceCaching__cached_refstr')
+
     def __init__(self, parent, type, name):
         assert parent is not None
         assert isinstance(type, types.Type)
         self.parent = parent
         self.type = type
+        # The instructions using this value, as an insertion-ordered dict,
+        # when use tracking is enabled in the module
+        self._users = None
         self._set_name(name)
 
     def _to_string(self):
-        buf = []
-        if not isinstance(self.type, types.VoidType):
-            buf.append("{0} = ".format(self.get_reference()))
+        # descr() appends the pieces of the text to a shared buffer, which
+        # is joined only once
+        if isinstance(self.type, types.VoidType):
+            buf = []
+        else:
+            buf = [self.get_reference(), " = "]
         self.descr(buf)
         return "".join(buf).rstrip()
 
@@ -552,12 +630,31 @@ class NamedValue(_StrCaching, _StringReferenceCaching, Value):
         raise NotImplementedError
 
     def _get_name(self):
-        return self._name
+        name = self._name
+        if name is None:
+            self.parent.scope.materialize()
+            name = self._name
+        return name
 
     def _set_name(self, name):
-        name = self.parent.scope.register(name,
-                                          deduplicate=self.deduplicate_name)
-        self._name = name
+        # The slot is unset until the value is first named
+        renamed = hasattr(self, '_name')
+        scope = self.parent.scope
+        if not name and scope.lazy and self.deduplicate_name:
+            # Only number anonymous values when their name is needed
+            self._name = None
+            scope.defer(self)
+        else:
+            self._name = scope.register(name,
+                                        deduplicate=self.deduplicate_name)
+        if renamed:
+            # Invalidate the cached text of this value and of the block
+            # and function containing it
+            try:
+                del self._StringReferenceCaching__cached_refstr
+            except AttributeError:
+                pass
+            self._clear_string_cache()
 
     name = property(_get_name, _set_name)
 
@@ -572,6 +669,37 @@ class NamedValue(_StrCaching, _StringReferenceCaching, Value):
         return "<ir.%s %r of type '%s'>" % (
             self.__class__.__name__, self.name, self.type)
 
+    def _add_user(self, user):
+        users = self._users
+        if users is None:
+            users = self._users = {}
+        users[user] = None
+
+    def _remove_user(self, user):
+        if self._users is not None:
+            self._users.pop(user, None)
+
+    @property
+    def users(self):
+        """
+        The set of instructions using this value as an operand.  This only
+        looks at the uses of this value if use tracking is enabled in the
+        module (see Module.track_uses), otherwise all instructions in the
+        module are scanned.
+        """
+        module = self.module
+        if module.track_uses:
+            return set(self._users or ())
+        return set([instr for instr in module._iter_instructions()
+                    if any(v is self for v in instr._get_used_values())])
+
+    def replace_all_uses_with(self, new):
+        """
+        Replace all uses of this value with *new*.
+        """
+        for user in self.users:
+            user.replace_usage(self, new)
+
     @property
     def function_type(self):
         ty = self.type
@@ -789,6 +917,10 @@ class GlobalValue(NamedValue, _ConstOpMixin, _HasMetadata):
         self.section = ''
         self.metadata = {}
 
+    @property
+    def module(self):
+        return self.parent
+
 
 class GlobalVariable(GlobalValue):
     """
@@ -941,7 +1073,10 @@ class Function(GlobalValue):
         assert isinstance(ftype, types.Type)
         super(Function, self).__init__(module, ftype.as_pointer(), name=name)
         self.ftype = ftype
-        self.scope = _utils.NameScope()
+        # Anonymous values are numbered in textual order when printed,
+        # or in creation order if their name is needed before
+        self.scope = _utils.NameScope(lazy=True,
+                                      order=self._iter_named_values)
         self.blocks = []
         self.attributes = FunctionAttributes()
         self.args = tuple([Argument(self, t)
@@ -974,6 +1109,12 @@ class Function(GlobalValue):
         self.blocks.insert(before, blk)
         return blk
 
+    def _iter_named_values(self):
+        yield from self.args
+        for blk in self.blocks:
+            yield blk
+            yield from blk.instructions
+
     def descr_prototype(self, buf):
         """
         Describe the prototype ("head") of the function.
@@ -1003,11 +1144,15 @@ class Function(GlobalValue):
     def descr_body(self, buf):
         """
         Describe of the body of the function.
+
+        The text of each block is cached and only rebuilt when the block
+        or one of its instructions was changed since the last call.
         """
-        for blk in self.blocks:
-            blk.descr(buf)
+        buf += [blk._get_descr() for blk in self.blocks]
 
     def descr(self, buf):
+        # Number the anonymous values in textual order, like LLVM
+        self.scope.materialize(ordered=True)
         self.descr_prototype(buf)
         if self.blocks:
             buf.append("{\n")
@@ -1111,6 +1256,10 @@ class _BaseArgument(NamedValue):
         self.parent = parent
         self.attributes = ArgumentAttributes()
 
+    @property
+    def module(self):
+        return self.parent.module
+
     def __repr__(self):
         return "<ir.%s %r of type %s>" % (self.__class__.__name__, self.name,
                                           self.type)
@@ -1154,12 +1303,15 @@ class Block(NamedValue):
     last instruction, and incoming branches can only jump to the first
     instruction.
     """
+    __slots__ = ('scope', 'instructions', 'terminator', '_descr_cache')
 
     def __init__(self, parent, name=''):
         super(Block, self).__init__(parent, types.LabelType(), name=name)
         self.scope = parent.scope
         self.instructions = []
         self.terminator = None
+        # A (instructions, text) pair, see _get_descr()
+        self._descr_cache = None
 
     @property
     def is_terminated(self):
@@ -1174,20 +1326,42 @@ class Block(NamedValue):
         return self.parent.module
 
     def descr(self, buf):
-        buf.append("{0}:\n".format(self._format_name()))
-        buf += ["  {0}\n".format(instr) for instr in self.instructions]
+        buf.append(self._get_descr())
+
+    def _is_descr_cache_valid(self):
+        # The instruction list can be mutated directly, so compare it
+        # with the one the cached text was built from.
+        cache = self._descr_cache
+        return cache is not None and cache[0] == self.instructions
+
+    def _get_descr(self):
+        if not self._is_descr_cache_valid():
+            buf = [self._format_name(), ":\n"]
+            for instr in self.instructions:
+                buf += ("  ", str(instr), "\n")
+            self._descr_cache = (list(self.instructions), "".join(buf))
+        return self._descr_cache[1]
+
+    def _clear_string_cache(self):
+        super(Block, self)._clear_string_cache()
+        self._descr_cache = None
+        self.parent._clear_string_cache()
 
     def replace(self, old, new):
         """Replace an instruction"""
         if old.type != new.type:
             raise TypeError("new instruction has a different type")
         pos = self.instructions.index(old)
-        self.instructions.remove(old)
-        self.instructions.insert(pos, new)
+        self.instructions[pos] = new
 
-        for bb in self.parent.basic_blocks:
-            for instr in bb.instructions:
+        if self.module.track_uses:
+            old._remove_uses()
+            for instr in old.users:
                 instr.replace_usage(old, new)
+        else:
+            for bb in self.parent.basic_blocks:
+                for instr in bb.instructions:
+                    instr.replace_usage(old, new)
 
     def _format_name(self):
         # Per the LLVM Language Ref on identifiers, names matching the following
@@ -0,0 +1,531 @@
+"""
+Micro-benchmarks of performance sensitive code paths.
+
+By default the benchmarks run at a small scale, as regular tests checking
+that the alternative code paths produce identical results.  Set the
+LLVMLITE_BENCHMARK_SCALE environment variable to a larger integer to run
+them on bigger inputs and print the timings.
+"""
+
+import array
+import gc
+import os
+import threading
+import time
+import tracemalloc
+import unittest
+
+from llvmlite import ir
+from llvmlite import binding as llvm
+from llvmlite import ir_layer_typed_pointers_enabled
+from llvmlite.tests import TestCase
+
+
+SCALE = int(os.environ.get('LLVMLITE_BENCHMARK_SCALE', '1'))
+
+int32 = ir.IntType(32)
+
+
+def make_module(nfuncs, ninstrs, context=None):
+    """
+    Create a module with *nfuncs* straight-line functions of about
+    *ninstrs* arithmetic instructions each.
+    """
+    if context is None:
+        context = ir.Context()
+    mod = ir.Module(name='bench', context=context)
+    fnty = ir.FunctionType(int32, (int32, int32))
+    for i in range(nfuncs):
+        fn = ir.Function(mod, fnty, 'func%d' % i)
+        builder = ir.IRBuilder(fn.append_basic_block('entry'))
+        a, b = fn.args
+        for j in range(ninstrs):
+            a, b = b, builder.add(a, b)
+        builder.ret(b)
+    return mod
+
+
+class BenchmarkTestCase(TestCase):
+
+    def timeit(self, label, func, repeat=3):
+        """
+        Run *func* *repeat* times and return the result of the last call.
+        The best timing is reported when running at a larger scale.
+        """
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            res = func()
+            best = min(best, time.perf_counter() - t0)
+        self.report(label, "%.6f s" % best)
+        return res
+
+    def report(self, label, value):
+        """
+        Report a measured *value* when running at a larger scale.
+        """
+        if SCALE > 1:
+            print("\n%s.%s: %s: %s" % (type(self).__name__,
+                                       self._testMethodName, label, value))
+
+
+class TestMemoryBenchmark(BenchmarkTestCase):
+
+    def test_instruction_memory(self):
+        ninstrs = 10000 * SCALE
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            mod = make_module(1, ninstrs)
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.report("memory per instruction",
+                    "%d bytes" % ((after - before) // ninstrs))
+        [block] = mod.get_global('func0').blocks
+        self.assertEqual(len(block.instructions), ninstrs + 1)
+        for instr in block.instructions:
+            self.assertEqual(vars(instr), {})
+
+    def compile_struct_module(self, context, i):
+        sty = context.get_identified_type("Struct%d" % i)
+        sty.set_body(int32, sty.as_pointer())
+        mod = make_module(1, 10, context=context)
+        ir.GlobalVariable(mod, sty, 'gv')
+        return str(mod)
+
+    def test_context_memory_growth(self):
+        ncompiles = 20 * SCALE
+        shared = ir.Context()
+        scoped = ir.Context()
+        growth = {}
+        for label, compile_one in [
+                ("shared context", lambda i: self.compile_struct_module(
+                    shared, i)),
+                ("child contexts", lambda i: self.compile_struct_module(
+                    scoped.child(), i))]:
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                for i in range(ncompiles):
+                    compile_one(i)
+                # Contexts and their types are reference cycles
+                gc.collect()
+                after = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+            growth[label] = after - before
+            self.report("memory growth with " + label,
+                        "%d bytes per compilation"
+                        % ((after - before) // ncompiles))
+        self.assertEqual(len(shared.identified_types), ncompiles)
+        self.assertEqual(len(scoped.identified_types), 0)
+        self.assertLess(growth["child contexts"], growth["shared context"])
+
+
+class TestBuilderBenchmark(BenchmarkTestCase):
+
+    def build_kernel(self, many):
+        # An unrolled kernel: c[i] = a[i] * b[i] + c[i]
+        n = 2000 * SCALE
+        mod = ir.Module(name='bench')
+        ptr = int32.as_pointer()
+        fnty = ir.FunctionType(ir.VoidType(), (ptr, ptr, ptr))
+        fn = ir.Function(mod, fnty, 'kernel')
+        builder = ir.IRBuilder(fn.append_basic_block('entry'))
+        a, b, c = fn.args
+        indices = [[int32(i)] for i in range(n)]
+        if many:
+            ptrs = [builder.gep_many(p, indices) for p in (a, b, c)]
+            va, vb, vc = [builder.load_many(p) for p in ptrs]
+            res = builder.add_many(builder.mul_many(va, vb), vc)
+            builder.store_many(res, ptrs[2])
+        else:
+            ptrs = [[builder.gep(p, idx) for idx in indices]
+                    for p in (a, b, c)]
+            va, vb, vc = [[builder.load(p) for p in ps] for ps in ptrs]
+            prods = [builder.mul(x, y) for x, y in zip(va, vb)]
+            res = [builder.add(x, y) for x, y in zip(prods, vc)]
+            for val, p in zip(res, ptrs[2]):
+                builder.store(val, p)
+        builder.ret_void()
+        return mod
+
+    def test_many_ops(self):
+        single = self.timeit("IRBuilder methods in a loop",
+                             lambda: self.build_kernel(many=False))
+        many = self.timeit("IRBuilder *_many() methods",
+                           lambda: self.build_kernel(many=True))
+        self.assertEqual(str(many), str(single))
+
+    def build_straight_line(self, validate, ninstrs):
+        mod = ir.Module(name='bench')
+        fnty = ir.FunctionType(int32, (int32, int32, int32.as_pointer()))
+        fn = ir.Function(mod, fnty, 'func')
+        builder = ir.IRBuilder(fn.append_basic_block('entry'),
+                               validate=validate)
+        a, b, ptr = fn.args
+        for i in range(ninstrs // 4):
+            c = builder.add(a, b)
+            d = builder.mul(c, builder.load(ptr))
+            builder.store(d, ptr)
+            a, b = d, c
+        builder.ret(a)
+        return mod
+
+    def test_validate(self):
+        ninstrs = 20000 * SCALE
+        mods = {}
+        for validate in (True, False):
+            t0 = time.perf_counter()
+            mods[validate] = self.build_straight_line(validate, ninstrs)
+            elapsed = time.perf_counter() - t0
+            self.report("IRBuilder(validate=%s)" % validate,
+                        "%d instructions/s" % (ninstrs / elapsed))
+        self.assertEqual(str(mods[False]), str(mods[True]))
+
+    def build_index_arithmetic(self, fold_constants, ninstrs):
+        # Address computations as typically emitted by front ends, with
+        # zero offsets, unit strides and constant bounds checks
+        mod = ir.Module(name='bench')
+        fnty = ir.FunctionType(int32, (int32, int32))
+        fn = ir.Function(mod, fnty, 'func')
+        builder = ir.IRBuilder(fn.append_basic_block('entry'),
+                               fold_constants=fold_constants)
+        a, b = fn.args
+        for i in range(ninstrs // 4):
+            offset = builder.add(a, int32(0))
+            stride = builder.mul(int32(i % 2), int32(4))
+            b = builder.add(builder.mul(offset, int32(1)), stride)
+            ok = builder.icmp_signed('<', int32(i), int32(ninstrs))
+            a = builder.select(ok, b, a)
+        builder.ret(a)
+        return mod
+
+    def test_fold_constants(self):
+        ninstrs = 20000 * SCALE
+        for fold_constants in (False, True):
+            t0 = time.perf_counter()
+            mod = self.build_index_arithmetic(fold_constants, ninstrs)
+            text = str(mod)
+            elapsed = time.perf_counter() - t0
+            label = "IRBuilder(fold_constants=%s)" % fold_constants
+            self.report(label + " build and format",
+                        "%.3f s" % elapsed)
+            self.report(label + " IR size", "%d bytes" % len(text))
+
+    def build_array_accesses(self, cse, ninstrs):
+        # Element accesses as emitted by front ends which recompute the
+        # address and reload the array descriptor for each access
+        mod = ir.Module(name='bench')
+        fnty = ir.FunctionType(int32, (int32.as_pointer().as_pointer(),))
+        fn = ir.Function(mod, fnty, 'func')
+        builder = ir.IRBuilder(fn.append_basic_block('entry'), cse=cse)
+        [desc] = fn.args
+        total = int32(0)
+        for i in range(ninstrs // 4):
+            data = builder.load(desc)
+            ptr = builder.gep(data, [int32(i % 16)])
+            total = builder.add(total, builder.load(ptr))
+        builder.ret(total)
+        return mod
+
+    def test_cse(self):
+        ninstrs = 20000 * SCALE
+        for cse in (False, True):
+            t0 = time.perf_counter()
+            mod = self.build_array_accesses(cse, ninstrs)
+            text = str(mod)
+            elapsed = time.perf_counter() - t0
+            label = "IRBuilder(cse=%s)" % cse
+            self.report(label + " build and format", "%.3f s" % elapsed)
+            self.report(label + " IR size", "%d bytes" % len(text))
+
+
+class TestPrintingBenchmark(BenchmarkTestCase):
+
+    def make_mixed_module(self, ninstrs):
+        # A single function mixing the most common instructions
+        mod = ir.Module(name='bench')
+        fnty = ir.FunctionType(int32, (int32, int32, int32.as_pointer()))
+        fn = ir.Function(mod, fnty, 'func')
+        builder = ir.IRBuilder(fn.append_basic_block('entry'))
+        a, b, ptr = fn.args
+        for i in range(ninstrs // 8):
+            c = builder.add(a, b)
+            d = builder.load(ptr)
+            builder.store(c, ptr)
+            cond = builder.icmp_signed('<', c, d)
+            ptr = builder.gep(ptr, [int32(1)])
+            e = builder.select(cond, c, d)
+            f = builder.zext(cond, int32)
+            res = builder.call(fn, [e, f, ptr])
+            a, b = res, e
+        builder.ret(a)
+        return mod
+
+    def test_printing_throughput(self):
+        # LLVMLITE_BENCHMARK_SCALE=100 gives a 1M-instruction module
+        ninstrs = 10000 * SCALE
+        mod = self.make_mixed_module(ninstrs)
+        t0 = time.perf_counter()
+        text = str(mod)
+        elapsed = time.perf_counter() - t0
+        self.report("str(module)", "%.6f s, %d instructions/s"
+                    % (elapsed, ninstrs / elapsed))
+        self.assertEqual(text.count('\n  '), ninstrs + 1)
+        ptrty = 'i32*' if ir_layer_typed_pointers_enabled else 'ptr'
+        self.assertIn('  %".4" = add i32 %".1", %".2"\n', text)
+        self.assertIn('  store i32 %%".4", %s %%".3"\n' % ptrty, text)
+
+
+class TestSerializationBenchmark(BenchmarkTestCase):
+
+    def test_to_string_workers(self):
+        expected = str(make_module(20 * SCALE, 1000))
+        worker_counts = [1, 2, 4, 8, 16] if SCALE > 1 else [1, 2]
+        for workers in worker_counts:
+            # Use a fresh module each time, as formatting caches text
+            mod = make_module(20 * SCALE, 1000)
+            text = self.timeit("to_string(workers=%d)" % workers,
+                               lambda: mod.to_string(workers=workers),
+                               repeat=1)
+            self.assertEqual(text, expected)
+
+
+class TestUseTrackingBenchmark(BenchmarkTestCase):
+
+    def replace_instructions(self, mod, count):
+        [block] = mod.get_global('func0').blocks
+        for old in block.instructions[:count]:
+            new = ir.Instruction(block, old.type, 'sub', old.operands)
+            block.replace(old, new)
+
+    def test_block_replace(self):
+        ninstrs = 1000 * SCALE
+        untracked = make_module(1, ninstrs)
+        tracked = make_module(1, ninstrs)
+        tracked.track_uses = True
+        self.timeit("Block.replace() without use tracking",
+                    lambda: self.replace_instructions(untracked, 100),
+                    repeat=1)
+        self.timeit("Block.replace() with use tracking",
+                    lambda: self.replace_instructions(tracked, 100),
+                    repeat=1)
+        self.assertEqual(str(tracked), str(untracked))
+
+
+class TestNameScopeBenchmark(BenchmarkTestCase):
+
+    def test_deduplicate(self):
+        from llvmlite.ir._utils import NameScope
+
+        def reference(names):
+            # Probe each candidate name, as done historically
+            useset = set([''])
+            basenamemap = {}
+            res = []
+            for name in names:
+                basename = name
+                while name in useset:
+                    ident = basenamemap.get(basename, 0) + 1
+                    basenamemap[basename] = ident
+                    name = "{0}.{1}".format(basename, ident)
+                useset.add(name)
+                res.append(name)
+            return res
+
+        def deduplicate(names):
+            scope = NameScope()
+            return [scope.register(name, deduplicate=True) for name in names]
+
+        # Explicit "<name>.<N>" names make the reference probe them all
+        n = 300 * SCALE
+        names = ['v.{0}'.format(i) for i in range(1, n)] + ['v'] * n
+        names += ['tmp', 'loop.body', '', 'x'] * n
+        expected = self.timeit("reference", lambda: reference(names))
+        got = self.timeit("NameScope", lambda: deduplicate(names))
+        self.assertEqual(got, expected)
+
+    def test_anonymous_values(self):
+        mod = self.timeit("build module", lambda: make_module(10 * SCALE, 1000))
+        text = self.timeit("str(module)", lambda: str(mod), repeat=1)
+        self.assertIn('%".1002" = add i32 %".1000", %".1001"', text)
+        # The numbered names aren't stored in the function scopes
+        for fn in mod.functions:
+            self.assertEqual(len(fn.scope._useset), 2)
+
+
+class TestConstantBenchmark(BenchmarkTestCase):
+
+    def test_escape_string(self):
+        from llvmlite.ir.values import _escape_string, _VALID_CHARS
+
+        def reference(text):
+            # One lookup per byte, as done historically
+            return ''.join([chr(ch) if ch in _VALID_CHARS else '\\%02x' % ch
+                            for ch in text])
+
+        n = 100000 * SCALE
+        inputs = {
+            'printable': b'some debug string, ' * (n // 19),
+            'c strings': b'identifier_name\0' * (n // 16),
+            'binary': bytes(range(256)) * (n // 256),
+        }
+        for label, text in inputs.items():
+            expected = self.timeit("%s: reference" % label,
+                                   lambda: reference(text))
+            got = self.timeit("%s: _escape_string" % label,
+                              lambda: _escape_string(text))
+            self.assertEqual(got, expected)
+
+    def test_buffer_array_constant(self):
+        n = 10000 * SCALE
+        values = list(range(-n // 2, n // 2))
+        buf = array.array('i', values)
+        ty = ir.ArrayType(int32, n)
+        from_list = self.timeit("str(Constant(ty, list))",
+                                lambda: str(ir.Constant(ty, values)))
+        from_buffer = self.timeit("str(Constant(ty, buffer))",
+                                  lambda: str(ir.Constant(ty, buf)))
+        self.assertEqual(from_buffer, from_list)
+
+    def test_buffer_float_array_constant(self):
+        n = 10000 * SCALE
+        values = [i / 7 for i in range(n)]
+        buf = array.array('d', values)
+        ty = ir.ArrayType(ir.DoubleType(), n)
+        from_list = self.timeit("str(Constant(ty, list))",
+                                lambda: str(ir.Constant(ty, values)))
+        from_buffer = self.timeit("str(Constant(ty, buffer))",
+                                  lambda: str(ir.Constant(ty, buf)))
+        self.assertEqual(from_buffer, from_list)
+
+
+class TestFFILockBenchmark(BenchmarkTestCase):
+    """
+    Contention on the FFI locks between threads using LLVM.
+    """
+
+    def walk_module(self, mod, results, i):
+        kinds = []
+        for fn in mod.functions:
+            for block in fn.blocks:
+                for instr in block.instructions:
+                    kinds.append(instr.type.type_kind)
+        results[i] = kinds
+
+    def walk_modules(self, mods):
+        results = [None] * len(mods)
+        threads = [threading.Thread(target=self.walk_module,
+                                    args=(mod, results, i))
+                   for i, mod in enumerate(mods)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_walk_modules(self):
+        nthreads = 4
+        text = str(make_module(SCALE, 1000))
+        mods = [llvm.parse_assembly(text) for i in range(nthreads)]
+        shared = self.timeit("%d threads, global context" % nthreads,
+                             lambda: self.walk_modules(mods))
+        mods = [llvm.parse_assembly(text, llvm.create_context())
+                for i in range(nthreads)]
+        separate = self.timeit("%d threads, separate contexts" % nthreads,
+                               lambda: self.walk_modules(mods))
+        self.assertEqual(separate, shared)
+
+    def compile_in_threads(self, texts, contexts):
+        results = [None] * len(texts)
+
+        def compile(i):
+            mod = llvm.parse_assembly(texts[i], contexts[i])
+            mod.verify()
+            results[i] = mod.as_bitcode()
+
+        threads = [threading.Thread(target=compile, args=(i,))
+                   for i in range(len(texts))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_context_locks(self):
+        nthreads = 4
+        texts = [str(make_module(10 * SCALE, 100)) for i in range(nthreads)]
+        shared = self.timeit(
+            "%d threads, global context" % nthreads,
+            lambda: self.compile_in_threads(
+                texts, [llvm.get_global_context()] * nthreads))
+        separate = self.timeit(
+            "%d threads, separate contexts" % nthreads,
+            lambda: self.compile_in_threads(
+                texts, [llvm.create_context() for i in range(nthreads)]))
+        self.assertEqual(shared, separate)
+
+    def background_rate(self, func):
+        """
+        Run *func* while a background thread repeatedly makes a cheap call
+        into LLVM, and return the number of calls made per second.
+        """
+        stop = threading.Event()
+        count = 0
+
+        def background():
+            nonlocal count
+            while not stop.is_set():
+                llvm.get_process_triple()
+                count += 1
+
+        thread = threading.Thread(target=background)
+        t0 = time.perf_counter()
+        thread.start()
+        try:
+            res = func()
+        finally:
+            stop.set()
+            thread.join()
+        return res, count / (time.perf_counter() - t0)
+
+    def test_background_thread(self):
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        text = str(make_module(20 * SCALE, 200))
+        tm = llvm.Target.from_default_triple().create_target_machine()
+
+        def compile(context):
+            return tm.emit_object(llvm.parse_assembly(text, context))
+
+        _, idle = self.background_rate(lambda: time.sleep(0.1))
+        self.report("background calls/s, idle", "%d" % idle)
+        shared, rate = self.background_rate(
+            lambda: compile(llvm.get_global_context()))
+        self.report("background calls/s, compiling in the global context",
+                    "%d" % rate)
+        separate, rate = self.background_rate(
+            lambda: compile(llvm.create_context()))
+        self.report("background calls/s, compiling in a separate context",
+                    "%d" % rate)
+        self.assertEqual(shared, separate)
+
+
+class TestCompileManyBenchmark(BenchmarkTestCase):
+
+    def test_compile_many(self):
+        texts = [str(make_module(5, 200)) for _ in range(8 * SCALE)]
+        workers = min(4, os.cpu_count() or 1)
+        serial = self.timeit(
+            "compile_many(), 1 worker",
+            lambda: llvm.compile_many(texts, workers=1), repeat=1)
+        parallel = self.timeit(
+            "compile_many(), %d workers" % workers,
+            lambda: llvm.compile_many(texts, workers=workers), repeat=1)
+        self.assertEqual(parallel, serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
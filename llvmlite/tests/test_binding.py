@@ -1,3 +1,4 @@
+import asyncio
 import ctypes
 import threading
 from ctypes import CFUNCTYPE, c_int, c_int32
@@ -5,17 +6,19 @@ from ctypes.util import find_library
 import gc
 import locale
 import os
+import pickle
 import platform
 import re
 import subprocess
 import sys
+import time
 import unittest
 from contextlib import contextmanager
 from tempfile import mkstemp
 
 from llvmlite import ir
 from llvmlite import binding as llvm
-from llvmlite.binding import ffi
+from llvmlite.binding import aio, ffi
 from llvmlite.tests import TestCase
 
 # arvm7l needs extra ABI symbols to link successfully
@@ -1575,6 +1578,26 @@ class TestOrcLLJIT(BaseTest):
         for th in ths:
             th.join()
 
+    def test_link_without_global_lock(self):
+        # Linking only takes the JIT's own lock
+        lljit = llvm.create_lljit_compiler()
+        llvm_ir = asm_sum.format(triple=llvm.get_default_triple())
+        trackers = []
+
+        def link():
+            trackers.append(llvm.JITLibraryBuilder()
+                            .add_ir(llvm_ir)
+                            .export_symbol("sum")
+                            .link(lljit, "sum"))
+
+        th = threading.Thread(target=link)
+        with llvm.ffi.lib._lock:
+            th.start()
+            th.join(timeout=60)
+            self.assertFalse(th.is_alive())
+        self.assertIs(trackers[0]._context, lljit)
+        self.assertTrue(trackers[0]["sum"])
+
     def test_add_object_file(self):
         target_machine = self.target_machine(jit=False)
         mod = self.module()
@@ -2604,6 +2627,132 @@ class TestLLVMLockCallbacks(BaseTest):
         with self.assertRaises(ValueError):
             llvm.ffi.unregister_lock_callback(acq, rel)
 
+    def test_threadsafe_functions(self):
+        events = []
+
+        def acq():
+            events.append('acq')
+
+        def rel():
+            events.append('rel')
+
+        mod = self.module()
+        self.assertTrue(llvm.ffi.lib.LLVMPY_DisposeString.threadsafe)
+        self.assertFalse(llvm.ffi.lib.LLVMPY_ParseAssembly.threadsafe)
+        # Queries may race with another thread modifying the module
+        self.assertFalse(llvm.ffi.lib.LLVMPY_GetModuleName.threadsafe)
+        self.assertFalse(llvm.ffi.lib.LLVMPY_TypeOf.threadsafe)
+        self.assertFalse(llvm.ffi.lib.LLVMPY_FunctionsIterNext.threadsafe)
+        llvm.ffi.register_lock_callback(acq, rel)
+        try:
+            # Printing takes the lock, freeing the string doesn't
+            str(mod)
+            self.assertEqual(events, ['acq', 'rel'])
+            del events[:]
+            mod.name
+            self.assertEqual(events, ['acq', 'rel'])
+        finally:
+            llvm.ffi.unregister_lock_callback(acq, rel)
+
+    def test_context_locks(self):
+        ctx = llvm.create_context()
+        self.assertIsNot(ctx._lock, llvm.ffi.lib._lock)
+        self.assertIs(llvm.get_global_context()._lock, llvm.ffi.lib._lock)
+        mod = self.module(context=ctx)
+        self.assertIs(mod._context, ctx)
+        func = mod.get_function("sum")
+        self.assertIs(func._context, ctx)
+        for block in func.blocks:
+            for insn in block.instructions:
+                self.assertIs(insn._context, ctx)
+        self.assertIs(func.type._context, ctx)
+        self.assertIs(mod.functions._context, ctx)
+        self.assertIs(func.blocks._context, ctx)
+        self.assertIs(func.attributes._context, ctx)
+        self.assertIs(self.module()._context._lock, llvm.ffi.lib._lock)
+
+    def test_shared_target_machine_lock(self):
+        # A target machine doesn't belong to a context, so that the calls
+        # using it from two contexts both take the global lock
+        tm = self.target_machine(jit=False)
+        lock = llvm.ffi.lib._lock
+        ctx_a = llvm.create_context()
+        ctx_b = llvm.create_context()
+        mod_a = self.module(context=ctx_a)
+        mod_b = self.module(context=ctx_b)
+        self.assertIs(ffi._select_lock((tm,), lock), lock)
+        self.assertIs(ffi._select_lock((mod_a, 1), lock), ctx_a._lock)
+        group_a = ffi._select_lock((tm, mod_a), lock)
+        group_b = ffi._select_lock((mod_b, tm), lock)
+        self.assertEqual(group_a._locks, [ctx_a._lock, lock])
+        self.assertEqual(group_b._locks, [ctx_b._lock, lock])
+        self.assertEqual(
+            ffi._select_lock((mod_b, tm, mod_a), lock)._locks,
+            [ctx_a._lock, ctx_b._lock, lock])
+
+        emitted = threading.Event()
+
+        def emit():
+            tm.emit_object(mod_b)
+            emitted.set()
+
+        t = threading.Thread(target=emit)
+        with group_a:
+            t.start()
+            self.assertFalse(emitted.wait(timeout=0.5))
+        self.assertTrue(emitted.wait(timeout=60))
+        t.join()
+        self.assertEqual(tm.emit_object(mod_a), tm.emit_object(mod_b))
+
+    def test_deferred_dispose(self):
+        # An object finalized while its lock is held by another thread is
+        # disposed of later, rather than blocking the finalizer
+        ctx = llvm.create_context()
+        mod = self.module(context=ctx)
+        disposed = []
+        mod._dispose = lambda: disposed.append(True)
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with ctx._lock:
+                held.set()
+                release.wait()
+
+        t = threading.Thread(target=hold)
+        t.start()
+        held.wait()
+        try:
+            del mod
+            gc.collect()
+            self.assertEqual(disposed, [])
+            self.assertEqual(len(ffi._pending_disposals), 1)
+        finally:
+            release.set()
+            t.join()
+        llvm.get_default_triple()
+        self.assertEqual(disposed, [True])
+        self.assertEqual(ffi._pending_disposals, [])
+
+    def test_context_lock_concurrency(self):
+        # Modules of a non-global context can be compiled while another
+        # thread holds the global lock
+        asm = asm_sum.format(triple=llvm.get_default_triple())
+        ctx = llvm.create_context()
+        done = threading.Event()
+
+        def compile():
+            mod = llvm.parse_assembly(asm, ctx)
+            mod.verify()
+            str(mod)
+            done.set()
+
+        t = threading.Thread(target=compile)
+        with llvm.ffi.lib._lock:
+            t.start()
+            self.assertTrue(done.wait(timeout=60))
+        t.join()
+
 
 class TestPipelineTuningOptions(BaseTest):
 
@@ -3014,6 +3163,146 @@ class TestNewFunctionPassManager(BaseTest, NewPassManagerMixin):
         fpm.add_refprune_pass()
 
 
+class TestAsyncio(BaseTest, NewPassManagerMixin):
+
+    def tearDown(self):
+        aio.set_max_workers(None)
+        super().tearDown()
+
+    def test_compile(self):
+        asm = asm_sum.format(triple=llvm.get_default_triple())
+        tm = self.target_machine(jit=False)
+        pb = self.pb(speed_level=3)
+
+        async def compile():
+            mod = await aio.aparse_assembly(asm, llvm.create_context())
+            await pb.getModulePassManager().arun(mod, pb)
+            asm_text = await tm.aemit_assembly(mod)
+            obj = await tm.aemit_object(mod)
+            return str(mod), asm_text, obj
+
+        ir_text, asm_text, obj = asyncio.run(compile())
+        self.assertNotIn("%.4", ir_text)
+        self.assertIn("sum", asm_text)
+        self.assertIsInstance(obj, bytes)
+
+    def test_concurrent_compile(self):
+        aio.set_max_workers(4)
+        texts = [asm_sum.format(triple=llvm.get_default_triple())
+                 .replace("@sum", "@sum%d" % i) for i in range(8)]
+
+        def compile_sync(text):
+            tm = self.target_machine(jit=False)
+            pb = self.pb(speed_level=2)
+            mod = llvm.parse_assembly(text, llvm.create_context())
+            pb.getModulePassManager().run(mod, pb)
+            return tm.emit_object(mod)
+
+        async def compile(text):
+            # Each job has its own context, target machine and pass builder
+            tm = self.target_machine(jit=False)
+            pb = self.pb(speed_level=2)
+            mod = await aio.aparse_assembly(text, llvm.create_context())
+            await pb.getModulePassManager().arun(mod, pb)
+            return await tm.aemit_object(mod)
+
+        async def compile_many():
+            return await asyncio.gather(*(compile(text) for text in texts))
+
+        objs = asyncio.run(compile_many())
+        self.assertEqual(objs, [compile_sync(text) for text in texts])
+
+    def test_alink(self):
+        lljit = llvm.create_lljit_compiler()
+        asm = asm_sum.format(triple=llvm.get_default_triple())
+
+        async def link(i):
+            return await (llvm.JITLibraryBuilder()
+                          .add_ir(asm)
+                          .export_symbol("sum")
+                          .alink(lljit, f"sum_{i}"))
+
+        async def link_many():
+            return await asyncio.gather(*(link(i) for i in range(8)))
+
+        for rt in asyncio.run(link_many()):
+            sum = CFUNCTYPE(c_int, c_int, c_int)(rt["sum"])
+            self.assertEqual(sum(2, 3), 5)
+
+    def test_errors(self):
+        with self.assertRaises(RuntimeError):
+            asyncio.run(aio.aparse_assembly("not llvm ir"))
+        with self.assertRaises(ValueError):
+            aio.set_max_workers(0)
+
+    def test_bounded_concurrency(self):
+        aio.set_max_workers(2)
+        self.assertEqual(aio.get_max_workers(), 2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work():
+            with lock:
+                running.append(None)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        async def run_many():
+            await asyncio.gather(*(aio.run(work) for _ in range(10)))
+
+        asyncio.run(run_many())
+        self.assertEqual(len(peak), 10)
+        self.assertLessEqual(max(peak), 2)
+
+
+class TestCompileMany(BaseTest):
+
+    def ir_texts(self, n):
+        asm = asm_sum.format(triple=llvm.get_default_triple())
+        return [asm.replace("@sum", "@sum%d" % i) for i in range(n)]
+
+    def test_compile_many(self):
+        texts = self.ir_texts(6)
+        objs = llvm.compile_many(texts, opt_level=3, workers=2)
+        self.assertEqual(len(objs), len(texts))
+        # The results don't depend on the worker compiling each module
+        self.assertEqual(llvm.compile_many(texts, opt_level=3, workers=1),
+                         objs)
+        lljit = llvm.create_lljit_compiler()
+        for i, obj in enumerate(objs):
+            rt = llvm.JITLibraryBuilder()\
+                .add_object_img(obj)\
+                .export_symbol("sum%d" % i)\
+                .link(lljit, "sum%d" % i)
+            sum = CFUNCTYPE(c_int, c_int, c_int)(rt["sum%d" % i])
+            self.assertEqual(sum(2, 3), 5)
+
+    def test_empty(self):
+        self.assertEqual(llvm.compile_many([]), [])
+
+    def test_errors(self):
+        texts = self.ir_texts(2) + ["not llvm ir"]
+        for workers in (1, 2):
+            with self.assertRaises(RuntimeError):
+                llvm.compile_many(texts, workers=workers)
+
+    def test_target_machine_spec(self):
+        spec = llvm.TargetMachineSpec()
+        self.assertIsNone(spec.triple)
+        self.assertEqual(pickle.loads(pickle.dumps(spec)), spec)
+        tm = spec.create_target_machine()
+        self.assertEqual(tm.triple,
+                         self.target_machine(jit=False).triple)
+        spec = llvm.TargetMachineSpec(triple=llvm.get_default_triple(),
+                                      reloc='pic')
+        self.assertEqual(spec.cpu, '')
+        self.assertIsInstance(spec.create_target_machine(opt=0),
+                              llvm.TargetMachine)
+
+
 @unittest.skipUnless(os.environ.get('LLVMLITE_DIST_TEST'),
                      "Distribution-specific test")
 @needs_lief
@@ -2,15 +2,24 @@
 IR Construction Tests
 """
 
+import array
 import copy
+import ctypes
+import gc
+import io
 import itertools
 import pickle
 import re
+import sys
+import tempfile
 import textwrap
+import threading
 import unittest
+import weakref
 
 from . import TestCase
 from llvmlite import ir
+from llvmlite.ir import module as ir_module
 from llvmlite import binding as llvm
 from llvmlite import ir_layer_typed_pointers_enabled
 
@@ -711,6 +720,144 @@ class TestIR(TestBase):
         self.assertInText(pat, str(mod))
         self.assert_valid_ir(mod)
 
+    def _streaming_module(self):
+        ctx = ir.Context()
+        mod = ir.Module(context=ctx)
+        sty = ctx.get_identified_type("MyType")
+        sty.set_body(int32, dbl)
+        gv = ir.GlobalVariable(mod, sty, 'gv')
+        gv.initializer = ir.Constant(sty, [int32(1), dbl(2.5)])
+        for name in ('foo', 'bar'):
+            fn = self.function(mod, name=name)
+            builder = ir.IRBuilder(fn.append_basic_block('entry'))
+            res = builder.add(fn.args[0], fn.args[1], 'res')
+            builder.ret(res)
+        ir.Function(mod, ir.FunctionType(ir.VoidType(), []), 'decl')
+        mod.add_named_metadata("foo", [int32(123)])
+        return mod
+
+    def test_iter_text_chunks(self):
+        mod = self._streaming_module()
+        chunks = list(mod.iter_text_chunks())
+        self.assertTrue(all(isinstance(c, str) for c in chunks))
+        self.assertEqual("".join(chunks), str(mod))
+        # An empty module only has the header
+        self.assertEqual("".join(self.module().iter_text_chunks()),
+                         str(self.module()))
+
+    def test_write_to_text_stream(self):
+        mod = self._streaming_module()
+        buf = io.StringIO()
+        mod.write_to(buf)
+        self.assertEqual(buf.getvalue(), str(mod))
+
+    def test_write_to_binary_stream(self):
+        mod = self._streaming_module()
+        mod.add_named_metadata("bar", ["été"])
+        buf = io.BytesIO()
+        mod.write_to(buf)
+        self.assertEqual(buf.getvalue(), str(mod).encode('utf8'))
+        with tempfile.TemporaryFile('w+b') as f:
+            mod.write_to(f)
+            f.seek(0)
+            self.assertEqual(f.read(), str(mod).encode('utf8'))
+
+    def _anonymous_module(self):
+        mod = self._streaming_module()
+        for i in range(5):
+            fn = self.function(mod, name='anon%d' % i)
+            builder = ir.IRBuilder(fn.append_basic_block())
+            builder.ret(builder.add(fn.args[0], fn.args[1]))
+        return mod
+
+    def test_to_string(self):
+        # Anonymous values are numbered by the workers
+        expected = str(self._anonymous_module())
+        mod = self._anonymous_module()
+        text = mod.to_string(workers=2)
+        self.assertEqual(text, expected)
+        self.assertEqual(mod.to_string(), text)
+        self.assertEqual(mod.to_string(workers=8), text)
+        self.assertEqual(self.module().to_string(workers=2),
+                         str(self.module()))
+
+    def test_to_string_threads(self):
+        expected = self._anonymous_module().to_string(workers=1)
+        mod = self._anonymous_module()
+        format_global_values = ir_module._format_global_values
+        can_fork = ir_module._can_fork
+        threads = set()
+
+        def format_in_thread(gvs, bounds):
+            threads.add(threading.get_ident())
+            return format_global_values(gvs, bounds)
+
+        ir_module._format_global_values = format_in_thread
+        ir_module._can_fork = lambda: False
+        try:
+            text = mod.to_string(workers=2)
+        finally:
+            ir_module._format_global_values = format_global_values
+            ir_module._can_fork = can_fork
+        self.assertEqual(text, expected)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_to_string_fork(self):
+        if not (getattr(sys, '_is_gil_enabled', lambda: True)() and
+                ir_module._can_fork()):
+            self.skipTest("to_string() doesn't fork here")
+        expected = self._anonymous_module().to_string(workers=1)
+        mod = self._anonymous_module()
+        text = mod.to_string(workers=2)
+        self.assertEqual(text, expected)
+        # The functions were formatted by the forked workers, in their own
+        # copy of the module
+        for i in range(5):
+            fn = mod.get_global('anon%d' % i)
+            self.assertIsNone(fn.blocks[0]._descr_cache)
+            self.assertIsNone(fn.args[0]._name)
+        self.assertEqual(str(mod), expected)
+
+    def test_only_used_identified_types(self):
+        ctx = ir.Context()
+        mod = ir.Module(context=ctx)
+        tys = {}
+        for name in 'ABCDEFG':
+            tys[name] = ctx.get_identified_type(name)
+        tys['A'].set_body(int32, tys['B'])
+        tys['B'].set_body(dbl)
+        tys['C'].set_body(int8)
+        tys['F'].set_body(tys['A'])
+        # A global's value type, and the types it contains
+        ir.GlobalVariable(mod, tys['A'], 'gv')
+        # An instruction's type
+        fn = self.function(mod)
+        builder = ir.IRBuilder(fn.append_basic_block())
+        builder.alloca(tys['C'])
+        # A type only referenced in the text of a formatted constant
+        sizeof = ir.FormattedConstant(
+            int64, 'ptrtoint (ptr getelementptr (%"D", ptr null, i32 1) '
+                   'to i64)')
+        builder.ret(builder.trunc(sizeof, int32))
+        # A type in metadata
+        mod.add_metadata([ir.Constant(tys['E'], None)])
+        self.assertEqual(list(mod.get_used_identified_types()),
+                         ['A', 'B', 'C', 'D', 'E'])
+        self.assertFalse(mod.only_used_identified_types)
+        text = str(mod)
+        self.assertIn('%"F" = type {%"A"}', text)
+        self.assertIn('%"G" = type opaque', text)
+        mod.only_used_identified_types = True
+        used_text = str(mod)
+        self.assertNotIn('%"F" =', used_text)
+        self.assertNotIn('%"G" =', used_text)
+        self.assertIn('%"C" = type {i8}', used_text)
+        self.assertIn('%"D" = type opaque', used_text)
+        self.assertEqual(used_text.splitlines(),
+                         [line for line in text.splitlines()
+                          if not line.startswith(('%"F" =', '%"G" ='))])
+
 
 class TestGlobalValues(TestBase):
 
@@ -829,6 +976,113 @@ class TestBlock(TestBase):
                 %"e" = mul i32 %"f", %".2"
             """)
 
+    def test_replace_tracked(self):
+        block = self.block(name='my_block')
+        block.module.track_uses = True
+        builder = ir.IRBuilder(block)
+        a, b = builder.function.args[:2]
+        c = builder.add(a, b, 'c')
+        d = builder.sub(a, b, 'd')
+        e = builder.mul(d, b, 'e')
+        f = ir.Instruction(block, a.type, 'sdiv', (c, b), 'f')
+        self.assertEqual(d.users, {e})
+        block.replace(d, f)
+        self.check_block(block, """\
+            my_block:
+                %"c" = add i32 %".1", %".2"
+                %"f" = sdiv i32 %"c", %".2"
+                %"e" = mul i32 %"f", %".2"
+            """)
+        self.assertEqual(d.users, set())
+        self.assertEqual(f.users, {e})
+        self.assertEqual(a.users, {c})
+        self.assertEqual(b.users, {c, e, f})
+
+    def test_descr_cache(self):
+        mod = self.module()
+        foo = self.function(mod, name='foo')
+        bar = self.function(mod, name='bar')
+        builders = []
+        for fn in (foo, bar):
+            builder = ir.IRBuilder(fn.append_basic_block('entry'))
+            a, b = fn.args[:2]
+            builder.add(a, b, 'c')
+            builders.append(builder)
+        str(mod)
+        foo_cache = foo.blocks[0]._descr_cache
+        bar_cache = bar.blocks[0]._descr_cache
+        # Changing one block only rebuilds that block's text
+        builder = builders[0]
+        builder.mul(*builder.function.args[:2], name='d')
+        str(mod)
+        self.assertIsNot(foo.blocks[0]._descr_cache, foo_cache)
+        self.assertIs(bar.blocks[0]._descr_cache, bar_cache)
+        self.assertIn('%"d" = mul i32', str(foo))
+        # Printing an unchanged module reuses the cached text
+        foo_cache = foo.blocks[0]._descr_cache
+        text = str(mod)
+        self.assertIs(foo.blocks[0]._descr_cache, foo_cache)
+        self.assertEqual(str(mod), text)
+
+    def test_descr_cache_rename(self):
+        block = self.block(name='my_block')
+        func = block.parent
+        builder = ir.IRBuilder(block)
+        a, b = func.args[:2]
+        c = builder.add(a, b, 'c')
+        text = str(func.module)
+        self.assertIn('my_block:', text)
+        # Renaming a block or an instruction invalidates the cached text
+        block.name = 'renamed_block'
+        c.name = 'renamed'
+        self.check_func_body(func, """\
+            renamed_block:
+                %"renamed" = add i32 %".1", %".2"
+            """)
+        text = str(func.module)
+        self.assertIn('renamed_block:', text)
+        self.assertNotIn('my_block', text)
+        self.assertIn('%"renamed" = add', text)
+
+    def test_descr_cache_invalidation(self):
+        block = self.block(name='my_block')
+        func = block.parent
+        builder = ir.IRBuilder(block)
+        a, b = func.args[:2]
+        c = builder.add(a, b, 'c')
+        phi = builder.phi(int32, 'p')
+        phi.add_incoming(a, block)
+        self.check_func_body(func, """\
+            my_block:
+                %"c" = add i32 %".1", %".2"
+                %"p" = phi  i32 [%".1", %"my_block"]
+            """)
+        # Mutating an instruction invalidates the cached text
+        phi.add_incoming(c, block)
+        md = func.module.add_metadata([int32(1)])
+        c.set_metadata('foo', md)
+        self.check_func_body(func, """\
+            my_block:
+                %"c" = add i32 %".1", %".2", !foo !0
+                %"p" = phi  i32 [%".1", %"my_block"], [%"c", %"my_block"]
+            """)
+        # So does changing the instruction list directly
+        builder.remove(phi)
+        self.check_func_body(func, """\
+            my_block:
+                %"c" = add i32 %".1", %".2", !foo !0
+            """)
+        block.instructions.append(phi)
+        other = func.append_basic_block('other')
+        ir.IRBuilder(other).ret(c)
+        self.check_func_body(func, """\
+            my_block:
+                %"c" = add i32 %".1", %".2", !foo !0
+                %"p" = phi  i32 [%".1", %"my_block"], [%"c", %"my_block"]
+            other:
+                ret i32 %"c"
+            """)
+
     def test_repr(self):
         """
         Blocks should have a useful repr()
@@ -1197,6 +1451,91 @@ my_block:
                 """)
         # XXX test with more complex types
 
+    def build_vectorized(self, builder, many):
+        a, b, _, ptr = builder.function.args
+        c = builder.alloca(ir.ArrayType(int32, 3), name='c')
+        indices = [[int32(0), int32(i)] for i in range(3)]
+        if many:
+            ptrs = builder.gep_many(c, indices, name='p')
+            vals = builder.load_many(ptrs, name='v')
+            sums = builder.add_many(vals, [a, b, a], name='s')
+            prods = builder.mul_many(sums, vals)
+            builder.sub_many(prods, sums)
+            builder.store_many(prods, [ptr] * 3, align=4)
+        else:
+            ptrs = [builder.gep(c, idx, name='p') for idx in indices]
+            vals = [builder.load(p, name='v') for p in ptrs]
+            sums = [builder.add(v, x, name='s')
+                    for v, x in zip(vals, [a, b, a])]
+            prods = [builder.mul(s, v) for s, v in zip(sums, vals)]
+            [builder.sub(p, s) for p, s in zip(prods, sums)]
+            [builder.store(p, ptr, align=4) for p in prods]
+        return ptrs
+
+    def test_many_ops(self):
+        # The *_many() methods build the same instructions as the
+        # corresponding methods called in a loop
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block)
+        builder.ret(builder.function.args[0])
+        builder.position_at_start(block)
+        ptrs = self.build_vectorized(builder, many=True)
+        self.assertEqual([p.name for p in ptrs], ['p', 'p.1', 'p.2'])
+        expected = self.block(name='my_block')
+        builder = ir.IRBuilder(expected)
+        self.build_vectorized(builder, many=False)
+        builder.ret(builder.function.args[0])
+        self.assertEqual(str(block.function), str(expected.function))
+        self.assertEqual(len(block.instructions), 20)
+        self.assertEqual(builder.add_many([], []), [])
+        a, b = builder.function.args[:2]
+        with self.assertRaises(ValueError):
+            builder.add_many([a, b], [a])
+        with self.assertRaises(ValueError):
+            builder.fadd_many([a], [ir.Constant(dbl, 1.0)])
+        with self.assertRaises(TypeError):
+            builder.load_many([ptrs[0], a])
+        with self.assertRaises(TypeError):
+            builder.store_many([a], [a])
+        with self.assertRaises(ValueError):
+            builder.store_many([a], [])
+
+    def build_redundant(self, builder, many):
+        a, b = builder.function.args[:2]
+        c = builder.alloca(ir.ArrayType(int32, 2), name='c')
+        indices = [[int32(0), int32(1)], [int32(0), int32(1)],
+                   [int32(0), int32(0)]]
+        lhs = [a, a, int32(2)]
+        rhs = [b, b, int32(3)]
+        if many:
+            ptrs = builder.gep_many(c, indices)
+            vals = builder.load_many(ptrs)
+            sums = builder.add_many(lhs, rhs)
+            builder.mul_many(sums, vals)
+        else:
+            ptrs = [builder.gep(c, idx) for idx in indices]
+            vals = [builder.load(p) for p in ptrs]
+            sums = [builder.add(x, y) for x, y in zip(lhs, rhs)]
+            [builder.mul(x, v) for x, v in zip(sums, vals)]
+        return ptrs, vals, sums
+
+    def test_many_ops_fold_cse(self):
+        # The *_many() methods fold constants and reuse values as the
+        # single operations do
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block, fold_constants=True, cse=True)
+        ptrs, vals, sums = self.build_redundant(builder, many=True)
+        self.assertIs(ptrs[0], ptrs[1])
+        self.assertIs(vals[0], vals[1])
+        self.assertIs(sums[0], sums[1])
+        self.assertIsInstance(sums[2], ir.Constant)
+        self.assertEqual(str(sums[2]), 'i32 5')
+        expected = self.block(name='my_block')
+        self.build_redundant(ir.IRBuilder(expected, fold_constants=True,
+                                          cse=True), many=False)
+        self.assertEqual(self.descr(block), self.descr(expected))
+        self.assertEqual(len(block.instructions), 8)
+
     def test_gep_castinstr(self):
         # similar to:
         # numba::runtime::nrtdynmod.py_define_nrt_meminfo_data()
@@ -2157,6 +2496,223 @@ class TestBuilderMisc(TestBase):
         self.assertIs(builder.module, block.parent.module)
         self.assertIsInstance(builder.module, ir.Module)
 
+    def build_unvalidated(self, builder):
+        a, b, c, d = builder.function.args
+        e = builder.add(a, b, 'e', flags=('nsw',))
+        f = builder.fneg(c, 'f')
+        builder.store(builder.mul(e, builder.load(d)), d)
+        builder.fadd(f, c)
+        builder.ret(e)
+
+    def test_no_validation(self):
+        self.assertTrue(ir.IRBuilder().validate)
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block, validate=False)
+        self.assertFalse(builder.validate)
+        self.build_unvalidated(builder)
+        expected = self.block(name='my_block')
+        self.build_unvalidated(ir.IRBuilder(expected))
+        self.assertEqual(self.descr(block), self.descr(expected))
+        self.assertEqual(block.instructions[0].flags, ['nsw'])
+        # Operands are not checked anymore
+        a, b, c, d = builder.function.args
+        builder.position_at_start(block)
+        builder.add(a, c)
+        builder.store(a, a)
+        with self.assertRaises(ValueError):
+            ir.IRBuilder(block).add(a, c)
+        # Nor for the batched operations
+        sums = builder.add_many([a, b], [c, a])
+        self.assertEqual(len(sums), 2)
+        with self.assertRaises(ValueError):
+            ir.IRBuilder(block).add_many([a, b], [c, a])
+        # The lists must still be the same length
+        with self.assertRaises(ValueError):
+            builder.add_many([a, b], [a])
+
+    def test_no_validation_custom_instruction(self):
+        class TaggedInstr(ir.Instruction):
+            __slots__ = ('tag',)
+
+            def __init__(self, *args, **kwargs):
+                super(TaggedInstr, self).__init__(*args, **kwargs)
+                self.tag = 'tagged'
+
+        class TaggedBuilder(ir.IRBuilder):
+            @ir.builder._binop('add', cls=TaggedInstr)
+            def tagged_add(self, lhs, rhs, name='', flags=()):
+                pass
+
+        for validate in (True, False):
+            block = self.block(name='my_block')
+            builder = TaggedBuilder(block, validate=validate)
+            a, b = builder.function.args[:2]
+            instr = builder.tagged_add(a, b, 'c')
+            self.assertIsInstance(instr, TaggedInstr)
+            self.assertEqual(instr.tag, 'tagged')
+            self.assertEqual(str(instr), '%"c" = add i32 %".1", %".2"')
+
+    def test_fold_constants(self):
+        self.assertFalse(ir.IRBuilder().fold_constants)
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block, fold_constants=True)
+        a, b = builder.function.args[:2]
+        # Constant operands
+        c = builder.add(int32(40), int32(2))
+        self.assertIsInstance(c, ir.Constant)
+        self.assertEqual(str(c), 'i32 42')
+        self.assertEqual(str(builder.sub(int32(1), int32(3))), 'i32 -2')
+        self.assertEqual(str(builder.mul(int8(16), int8(16))), 'i8 0')
+        self.assertEqual(str(builder.udiv(int8(-1), int8(2))), 'i8 127')
+        self.assertEqual(str(builder.sdiv(int32(-7), int32(2))), 'i32 -3')
+        self.assertEqual(str(builder.srem(int32(-7), int32(2))), 'i32 -1')
+        self.assertEqual(str(builder.ashr(int8(-128), int8(7))), 'i8 -1')
+        self.assertEqual(str(builder.lshr(int8(-128), int8(7))), 'i8 1')
+        self.assertEqual(str(builder.not_(int32(0))), 'i32 -1')
+        self.assertEqual(str(builder.neg(int32(5))), 'i32 -5')
+        self.assertEqual(str(builder.icmp_signed('<', int8(-1), int8(1))),
+                         'i1 true')
+        self.assertEqual(str(builder.icmp_unsigned('<', int8(-1), int8(1))),
+                         'i1 false')
+        self.assertEqual(str(builder.trunc(int32(257), int8)), 'i8 1')
+        self.assertEqual(str(builder.sext(int8(-2), int32)), 'i32 -2')
+        self.assertEqual(str(builder.zext(int8(-2), int32)), 'i32 254')
+        # Trivial identities
+        self.assertIs(builder.add(a, int32(0)), a)
+        self.assertIs(builder.add(int32(0), a), a)
+        self.assertIs(builder.sub(a, int32(0)), a)
+        self.assertIs(builder.mul(int32(1), a), a)
+        self.assertIs(builder.sdiv(a, int32(1)), a)
+        self.assertIs(builder.and_(a, int32(-1)), a)
+        self.assertIs(builder.shl(a, int32(0)), a)
+        self.assertEqual(str(builder.mul(a, int32(0))), 'i32 0')
+        self.assertIs(builder.select(ir.Constant(int1, True), a, b), a)
+        self.assertIs(builder.select(ir.Constant(int1, False), a, b), b)
+        self.assertEqual(block.instructions, [])
+        # Undefined results and other operations are left to LLVM
+        builder.sdiv(int32(1), int32(0))
+        builder.shl(int8(1), int8(8))
+        builder.sub(int32(0), a)
+        builder.mul(a, int32(2))
+        builder.fadd(ir.Constant(dbl, 1.0), ir.Constant(dbl, 2.0))
+        builder.icmp_signed('==', a, int32(0))
+        self.check_block(block, """\
+            my_block:
+                %".6" = sdiv i32 1, 0
+                %".7" = shl i8 1, 8
+                %".8" = sub i32 0, %".1"
+                %".9" = mul i32 %".1", 2
+                %".10" = fadd double 0x3ff0000000000000, 0x4000000000000000
+                %".11" = icmp eq i32 %".1", 0
+            """)
+
+    def test_cse(self):
+        self.assertFalse(ir.IRBuilder().cse)
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block, cse=True)
+        a, b, c, d = builder.function.args
+        e = builder.add(a, b, 'e')
+        self.assertIs(builder.add(a, b), e)
+        self.assertIs(builder.add(a, int32(1)), builder.add(a, int32(1)))
+        self.assertIsNot(builder.add(a, b, flags=('nsw',)), e)
+        self.assertIsNot(builder.add(b, a), e)
+        self.assertIs(builder.icmp_signed('<', a, b),
+                      builder.icmp_signed('<', a, b))
+        self.assertIs(builder.fcmp_ordered('<', c, c),
+                      builder.fcmp_ordered('<', c, c))
+        self.assertIs(builder.sext(a, int64), builder.sext(a, int64))
+        self.assertIs(builder.gep(d, [int32(1)]), builder.gep(d, [int32(1)]))
+        # Loads are reused until memory may be written
+        f = builder.load(d, 'f')
+        self.assertIs(builder.load(d), f)
+        builder.store(e, d)
+        g = builder.load(d, 'g')
+        self.assertIsNot(g, f)
+        builder.call(builder.function, [a, b, c, d])
+        self.assertIsNot(builder.load(d), g)
+        # Instructions after the insertion point can't be reused
+        builder.position_at_start(block)
+        h = builder.add(a, b, 'h')
+        self.assertIsNot(h, e)
+        builder.position_at_end(block)
+        self.assertIs(builder.sub(a, b), builder.sub(a, b))
+        # Nor the removed ones
+        i = builder.mul(a, b, 'i')
+        builder.remove(i)
+        self.assertIsNot(builder.mul(a, b), i)
+        # Each block has its own instructions, and only the instructions
+        # of the current block are kept
+        other = builder.append_basic_block('other')
+        with builder.goto_block(other):
+            self.assertIsNot(builder.add(a, b), e)
+        self.assertIsNot(builder.add(a, b), e)
+        self.check_block(block, """\
+            my_block:
+                %"h" = add i32 %".1", %".2"
+                %"e" = add i32 %".1", %".2"
+                %".6" = add i32 %".1", 1
+                %".7" = add nsw i32 %".1", %".2"
+                %".8" = add i32 %".2", %".1"
+                %".9" = icmp slt i32 %".1", %".2"
+                %".10" = fcmp olt double %".3", %".3"
+                %".11" = sext i32 %".1" to i64
+                %".12" = getelementptr i32, i32* %".4", i32 1
+                %"f" = load i32, i32* %".4"
+                store i32 %"e", i32* %".4"
+                %"g" = load i32, i32* %".4"
+                %".14" = call i32 @"my_func"(i32 %".1", i32 %".2", double %".3", i32* %".4")
+                %".15" = load i32, i32* %".4"
+                %".16" = sub i32 %".1", %".2"
+                %".17" = mul i32 %".1", %".2"
+                %".19" = add i32 %".1", %".2"
+            """)  # noqa E501
+
+    def test_cse_invalidation(self):
+        # Instructions changed by other means than the builder aren't
+        # reused
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block, cse=True)
+        a, b, _, d = builder.function.args
+        # Block.replace()
+        c = builder.add(a, b, 'c')
+        new = ir.Instruction(block, int32, 'mul', (a, b), 'new')
+        block.replace(c, new)
+        self.assertIsNot(builder.add(a, b), c)
+        # Direct edits to the instruction list
+        e = builder.sub(a, b, 'e')
+        block.instructions.remove(e)
+        self.assertIsNot(builder.sub(a, b), e)
+        builder.position_at_end(block)
+        f = builder.mul(b, b, 'f')
+        block.instructions.insert(0, block.instructions.pop())
+        self.assertIsNot(builder.mul(b, b), f)
+        builder.position_at_end(block)
+        # replace_all_uses_with() rewriting the operands
+        g = builder.sdiv(a, b, 'g')
+        a.replace_all_uses_with(b)
+        self.assertIsNot(builder.sdiv(a, b), g)
+        self.assertIs(builder.sdiv(b, b), builder.sdiv(b, b))
+        # Stores inserted by another builder
+        ld = builder.load(d, 'ld')
+        self.assertIs(builder.load(d), ld)
+        ir.IRBuilder(block).store(a, d)
+        self.assertIsNot(builder.load(d), ld)
+        # Flags changed after the instruction was built
+        h = builder.add(b, b, 'h')
+        h.flags.append('nsw')
+        self.assertIsNot(builder.add(b, b), h)
+
+    def test_cse_tables(self):
+        # Only the tables of the current block are kept
+        func = self.function()
+        builder = ir.IRBuilder(func.append_basic_block(), cse=True)
+        a, b = func.args[:2]
+        for i in range(10):
+            builder.position_at_end(func.append_basic_block())
+            builder.add(a, b)
+            self.assertIs(builder._cse_block, builder.block)
+            self.assertEqual(len(builder._cse_tables[0]), 1)
+
     def test_goto_block(self):
         block = self.block(name='my_block')
         builder = ir.IRBuilder(block)
@@ -2443,6 +2999,142 @@ class TestBuilderMisc(TestBase):
                     %"c" = alloca i32*, !dbg !0
                 """)
 
+    def test_compact_instructions(self):
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block)
+        a, b = builder.function.args[:2]
+        c = builder.add(a, b, 'c', flags=['nsw'])
+        d = builder.mul(a, c, 'd')
+        e = builder.sub(d, c, 'e')
+        builder.ret_void()
+        # The attributes are stored in slots
+        for value in block.instructions + [block]:
+            self.assertEqual(vars(value), {}, value)
+        # Flags and metadata are only allocated when needed
+        self.assertEqual(c.flags, ['nsw'])
+        self.assertEqual(str(d), '%"d" = mul i32 %".1", %"c"')
+        self.assertIsNone(d._flags)
+        self.assertIsNone(d._metadata)
+        e.flags.append('nuw')
+        e.set_metadata('foo', builder.module.add_metadata([]))
+        self.check_block(block, """\
+            my_block:
+                %"c" = add nsw i32 %".1", %".2"
+                %"d" = mul i32 %".1", %"c"
+                %"e" = sub nuw i32 %"d", %"c", !foo !0
+                ret void
+            """)
+
+    def test_slotted_values_compat(self):
+        # Slotted values can still be weakly referenced and given ad-hoc
+        # attributes, as user code may do
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block)
+        a, b = builder.function.args[:2]
+        c = builder.add(a, b, 'c')
+        for value in (block, c, a):
+            ref = weakref.ref(value)
+            self.assertIs(ref(), value)
+            value.annotation = 'foo'
+            self.assertEqual(value.annotation, 'foo')
+        self.assertEqual(str(c), '%"c" = add i32 %".1", %".2"')
+
+    def check_users(self, track_uses):
+        mod = self.module()
+        mod.track_uses = track_uses
+        fnty = ir.FunctionType(int32, [int32, int32])
+        func = ir.Function(mod, fnty, 'func')
+        other = ir.Function(mod, fnty, 'other')
+        entry = func.append_basic_block('entry')
+        loop = func.append_basic_block('loop')
+        builder = ir.IRBuilder(entry)
+        a, b = func.args
+        c = builder.add(a, b, 'c')
+        d = builder.mul(c, c, 'd')
+        e = builder.call(func, [d, a], 'e')
+        br1 = builder.branch(loop)
+        builder.position_at_end(loop)
+        phi = builder.phi(int32, 'phi')
+        phi.add_incoming(c, entry)
+        phi.add_incoming(phi, loop)
+        f = builder.sub(phi, b, 'f')
+        br2 = builder.branch(loop)
+        self.assertEqual(a.users, {c, e})
+        self.assertEqual(b.users, {c, f})
+        self.assertEqual(c.users, {d, phi})
+        self.assertEqual(phi.users, {phi, f})
+        self.assertEqual(func.users, {e})
+        self.assertEqual(loop.users, {br1, br2})
+        self.assertEqual(f.users, set())
+        # Replace all uses
+        c.replace_all_uses_with(b)
+        self.assertEqual(c.users, set())
+        self.assertEqual(b.users, {c, d, phi, f})
+        self.assertEqual(ir.replace_all_calls(mod, func, other), [e])
+        self.assertEqual(func.users, set())
+        self.assertEqual(other.users, {e})
+        e.callee = func
+        self.assertEqual(func.users, {e})
+        self.assertEqual(other.users, set())
+        # Removing an instruction removes its uses
+        builder.position_at_end(entry)
+        builder.remove(d)
+        self.assertEqual(b.users, {c, phi, f})
+        self.assertIn('[%".2", %"entry"]', str(phi))
+        self.assertIn('%"d" = mul i32 %".2", %".2"', str(d))
+
+    def test_users(self):
+        self.check_users(track_uses=False)
+
+    def test_replace_aggregate_and_gep_uses(self):
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block)
+        builder.module.track_uses = True
+        sty = ir.LiteralStructType((int32, int32))
+        p = builder.alloca(int32, name='p')
+        q = builder.alloca(int32, name='q')
+        i = builder.alloca(int32, name='i')
+        j = builder.alloca(int32, name='j')
+        gep = builder.gep(p, [int32(0)], name='gep')
+        agg = builder.load(builder.alloca(sty, name='s'), name='agg')
+        agg2 = builder.load(builder.alloca(sty, name='t'), name='agg2')
+        x = builder.load(i, name='x')
+        y = builder.load(j, name='y')
+        ev = builder.extract_value(agg, 0, name='ev')
+        iv = builder.insert_value(agg, x, 1, name='iv')
+        p.replace_all_uses_with(q)
+        agg.replace_all_uses_with(agg2)
+        x.replace_all_uses_with(y)
+        self.assertEqual(q.users, {gep})
+        self.assertEqual(agg2.users, {ev, iv})
+        self.assertEqual(y.users, {iv})
+        self.assertEqual(
+            str(gep), '%"gep" = getelementptr i32, i32* %"q", i32 0')
+        self.assertEqual(
+            str(ev), '%"ev" = extractvalue {i32, i32} %"agg2", 0')
+        self.assertEqual(
+            str(iv),
+            '%"iv" = insertvalue {i32, i32} %"agg2", i32 %"y", 1')
+
+    def test_users_tracked(self):
+        self.check_users(track_uses=True)
+
+    def test_track_uses_later(self):
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block)
+        a, b = builder.function.args[:2]
+        c = builder.add(a, b, 'c')
+        d = builder.sub(c, b, 'd')
+        mod = block.module
+        self.assertFalse(mod.track_uses)
+        self.assertIsNone(c._users)
+        mod.track_uses = True
+        self.assertEqual(c.users, {d})
+        self.assertEqual(b.users, {c, d})
+        mod.track_uses = False
+        self.assertIsNone(c._users)
+        self.assertEqual(c.users, {d})
+
 
 class TestTypes(TestBase):
 
@@ -2685,6 +3377,55 @@ class TestTypes(TestBase):
     def test_hash(self):
         for typ in filter(self.has_logical_equality, self.assorted_types()):
             self.assertEqual(hash(typ), hash(copy.copy(typ)))
+        # Equal typed and opaque pointers have the same hash
+        self.assertEqual(hash(ir.PointerType(int8)), hash(ir.PointerType()))
+        self.assertEqual(hash(ir.ArrayType(ir.PointerType(int8), 2)),
+                         hash(ir.ArrayType(ir.PointerType(), 2)))
+
+    def test_interning(self):
+        context = ir.Context()
+        mytype = context.get_identified_type("MyType")
+
+        def make_types():
+            return [
+                ir.VoidType(), ir.MetaDataType(), ir.IntType(1024),
+                ir.PointerType(), ir.PointerType(addrspace=1),
+                ir.PointerType(int8), ir.PointerType(flt, 2),
+                ir.FunctionType(int1, (int8, dbl)),
+                ir.FunctionType(int1, [int8], var_arg=True),
+                ir.ArrayType(flt, 5), ir.VectorType(int32, 4),
+                ir.LiteralStructType((int1, ir.PointerType(int8))),
+                ir.LiteralStructType((int1, int8), packed=True),
+            ]
+
+        for a, b in zip(make_types(), make_types()):
+            self.assertIs(a, b)
+            self.assertIs(copy.copy(a), a)
+            self.assertIs(copy.deepcopy(a), a)
+            self.assertIs(pickle.loads(pickle.dumps(a, protocol=-1)), a)
+        # Typed and opaque pointers compare equal but are distinct types
+        self.assertIsNot(ir.PointerType(int8), ir.PointerType())
+        self.assertIsNot(ir.ArrayType(ir.PointerType(int8), 2),
+                         ir.ArrayType(ir.PointerType(), 2))
+        self.assertIsNot(ir.LiteralStructType((int1,)),
+                         ir.LiteralStructType((int1,), packed=True))
+        # Identified struct types are interned by identity, not name
+        self.assertIs(ir.PointerType(mytype, 2), ir.PointerType(mytype, 2))
+        other = ir.Context().get_identified_type("MyType")
+        self.assertIsNot(ir.ArrayType(mytype, 2), ir.ArrayType(other, 2))
+
+    def test_interning_is_weak(self):
+        ty = ir.ArrayType(ir.IntType(12345), 3)
+        ref = weakref.ref(ty)
+        del ty
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_literal_struct_packed_readonly(self):
+        ty = ir.LiteralStructType((int1, int8))
+        with self.assertRaises(AttributeError):
+            ty.packed = True
+        self.assertFalse(ty.packed)
 
     def test_gep(self):
         def check_constant(tp, i, expected):
@@ -2938,6 +3679,128 @@ class TestConstant(TestBase):
         c = int32(42)
         self.assertEqual(repr(c), "<ir.Constant type='i32' value=42>")
 
+    def test_equality(self):
+        """
+        Constants compare equal if and only if they have the same
+        textual form.
+        """
+        at = ir.ArrayType(int8, 3)
+        st = ir.LiteralStructType((int32, flt))
+        nan = float('nan')
+        consts = [
+            int32(1), int32(True), int32(1.0), int8(1), int1(1), int1(True),
+            int32(-1), int32(2 ** 32 - 1),
+            flt(1), flt(1.0), dbl(1), dbl(1.0), flt(nan), flt(nan),
+            dbl(-0.0), dbl(0.0),
+            int32(None), int32(ir.Undefined), at(None),
+            at(bytearray(b'abc')), at([97, 98, 99]), at([int8(97), 98, 99]),
+            at([1, 2, 3]), st((1, 1.5)), st((int32(1), flt(1.5))),
+            st((1, 2.5)), st(None),
+            ir.FormattedConstant(int32, '1'),
+            ir.Constant(ir.PointerType(int8), None),
+            ir.Constant(ir.PointerType(), None),
+        ]
+        for a in consts:
+            for b in consts:
+                self.assertEqual(a == b, str(a) == str(b), (a, b))
+                self.assertEqual(a != b, str(a) != str(b), (a, b))
+                if a == b:
+                    self.assertEqual(hash(a), hash(b), (a, b))
+        self.assertNotEqual(int32(1), 1)
+
+    def test_equality_does_not_format(self):
+        at = ir.ArrayType(int32, 1000)
+        a = at(list(range(1000)))
+        b = at(list(range(1000)))
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, at(list(range(1, 1001))))
+        self.assertFalse(hasattr(a, '_StrCaching__cached_str'))
+        self.assertFalse(hasattr(b, '_StrCaching__cached_str'))
+
+    def test_buffer_arrays(self):
+        """
+        Array and vector constants can be created from buffer-protocol
+        objects, giving the same constants as from lists.
+        """
+        cases = [
+            (int32, array.array('i', [1, -2, 2 ** 31 - 1])),
+            (int32, array.array('I', [1, 2, 2 ** 32 - 1])),
+            (int64, array.array('q', [1, -2, 3])),
+            (int32, (ctypes.c_int32.__ctype_be__ * 3)(1, -2, 300)),
+            (flt, array.array('f', [0.0, 1.5, 0.1])),
+            (dbl, array.array('d', [-0.0, float('inf'), 0.1])),
+            (dbl, (ctypes.c_double.__ctype_be__ * 3)(1.5, 2, -3)),
+        ]
+        for elem, buf in cases:
+            values = list(buf)
+            for ty in (ir.ArrayType(elem, 3), ir.VectorType(elem, 3)):
+                a = ir.Constant(ty, values)
+                b = ir.Constant(ty, buf)
+                self.assertEqual(str(b), str(a))
+                self.assertEqual(b, a)
+                self.assertEqual(hash(b), hash(a))
+        # The buffer is copied
+        buf = array.array('i', [1, 2, 3])
+        c = ir.Constant(ir.ArrayType(int32, 3), buf)
+        buf[0] = 42
+        self.assertEqual(str(c), '[3 x i32] [i32 1, i32 2, i32 3]')
+        self.assert_pickle_correctly(c)
+        # Bytes are emitted as a string
+        at = ir.ArrayType(int8, 4)
+        self.assertEqual(str(at(b'ab"\x00')), '[4 x i8] c"ab\\22\\00"')
+        self.assertEqual(str(at(array.array('b', [97, 98, 34, 0]))),
+                         '[4 x i8] c"ab\\22\\00"')
+        self.assertEqual(str(ir.VectorType(int8, 2)(b'ab')),
+                         '<2 x i8> <i8 97, i8 98>')
+        c = ir.ArrayType(int1, 2)(memoryview(b'\x01\x00').cast('?'))
+        self.assertEqual(str(c), '[2 x i1] [i1 1, i1 0]')
+        # A 0-d buffer (e.g. a NumPy scalar) is a single value, splatted
+        # over the vector
+        scalar = ctypes.c_int32(5)
+        self.assertEqual(memoryview(scalar).ndim, 0)
+        c = ir.VectorType(int32, 4)(scalar)
+        self.assertEqual(len(c.constant), 4)
+        for elem in c.constant:
+            self.assertIs(elem.constant, scalar)
+        # Wrong size or format
+        with self.assertRaises(ValueError):
+            ir.ArrayType(int32, 2)(array.array('i', [1, 2, 3]))
+        with self.assertRaises(TypeError):
+            ir.ArrayType(int32, 2)(array.array('q', [1, 2]))
+        with self.assertRaises(TypeError):
+            ir.ArrayType(int32, 2)(array.array('f', [1, 2]))
+        with self.assertRaises(TypeError):
+            ir.ArrayType(flt, 2)(array.array('d', [1, 2]))
+        with self.assertRaises(TypeError):
+            ir.ArrayType(flt, 2)(array.array('i', [1, 2]))
+
+    def test_buffer_vector_shuffle_mask(self):
+        block = self.block(name='my_block')
+        builder = ir.IRBuilder(block)
+        vec = ir.Constant(ir.VectorType(int32, 2), [1, 2])
+        mask = ir.Constant(ir.VectorType(int32, 3), array.array('i', [1, 0, 3]))
+        builder.shuffle_vector(vec, vec, mask, name='shuf')
+        self.assertIn('<3 x i32> <i32 1, i32 0, i32 3>', str(block))
+        mask = ir.Constant(ir.VectorType(int32, 1), array.array('i', [4]))
+        with self.assertRaises(IndexError):
+            builder.shuffle_vector(vec, vec, mask)
+
+    def test_escape_string(self):
+        from llvmlite.ir.values import _escape_string, _VALID_CHARS
+        self.assertEqual(_escape_string(b''), '')
+        self.assertEqual(_escape_string(b'abc XYZ 123'), 'abc XYZ 123')
+        self.assertEqual(_escape_string(bytearray(b'a"b\\c\n\x00')),
+                         'a\\22b\\5cc\\0a\\00')
+        self.assertEqual(_escape_string('h\xe9!'), 'h\\c3\\a9!')
+        # Few or many characters to escape
+        self.assertEqual(_escape_string(b'x' * 100 + b'\xff'),
+                         'x' * 100 + '\\ff')
+        self.assertEqual(_escape_string(b'\x01\x02' * 100), '\\01\\02' * 100)
+        expected = ''.join(chr(ch) if ch in _VALID_CHARS
+                           else '\\%02x' % ch for ch in range(256))
+        self.assertEqual(_escape_string(bytes(range(256))), expected)
+
     def test_encoding_problem(self):
         c = ir.Constant(ir.ArrayType(ir.IntType(8), 256),
                         bytearray(range(256)))
@@ -3181,6 +4044,195 @@ class TestTransforms(TestBase):
         self.assertNotEqual(call.callee, foo)
         self.assertEqual(call.callee, bar)
 
+    def test_call_transform_tracked(self):
+        mod = ir.Module()
+        mod.track_uses = True
+        foo = ir.Function(mod, ir.FunctionType(ir.VoidType(), ()), "foo")
+        bar = ir.Function(mod, ir.FunctionType(ir.VoidType(), ()), "bar")
+        builder = ir.IRBuilder()
+        builder.position_at_end(foo.append_basic_block())
+        call = builder.call(foo, ())
+        modified = ir.replace_all_calls(mod, foo, bar)
+        self.assertEqual(modified, [call])
+        self.assertEqual(call.callee, bar)
+        self.assertEqual(foo.users, set())
+        self.assertEqual(bar.users, {call})
+
+
+class TestNameScope(TestBase):
+
+    def test_deduplicate(self):
+        scope = ir._utils.NameScope()
+        self.assertEqual(scope.register('a'), 'a')
+        self.assertEqual(scope.register('b', deduplicate=True), 'b')
+        self.assertEqual(scope.register('a', deduplicate=True), 'a.1')
+        self.assertEqual(scope.register('a', deduplicate=True), 'a.2')
+        self.assertEqual(scope.register('a.2', deduplicate=True), 'a.2.1')
+        self.assertEqual(scope.register('', deduplicate=True), '.1')
+        # deduplicate() doesn't register the name
+        self.assertEqual(scope.deduplicate('c'), 'c')
+        self.assertEqual(scope.deduplicate('a'), 'a.3')
+        self.assertFalse(scope.is_used('a.3'))
+        self.assertEqual(scope.deduplicate('a'), 'a.4')
+        with self.assertRaises(ir._utils.DuplicatedNameError):
+            scope.register('a.1')
+        # Explicitly registered names are never generated
+        self.assertEqual(scope.register('a.10'), 'a.10')
+        self.assertEqual(scope.register('a.7'), 'a.7')
+        self.assertEqual(scope.register('a', deduplicate=True), 'a.11')
+        self.assertEqual(scope.register('x.01'), 'x.01')
+        self.assertEqual(scope.register('x'), 'x')
+        self.assertEqual(scope.register('x', deduplicate=True), 'x.2')
+
+    def test_lazy_names(self):
+        func = self.function()
+        self.assertTrue(func.scope.lazy)
+        block = func.append_basic_block()
+        builder = ir.IRBuilder(block)
+        a, b = func.args[:2]
+        c = builder.add(a, b)
+        d = builder.sub(c, b, 'd')
+        e = builder.mul(c, d)
+        f = builder.mul(e, d)
+        for value in (a, b, block, c, e, f):
+            self.assertIsNone(value._name)
+        self.assertEqual(d.name, 'd')
+        f.name = 'f'
+        # A name needed before the function is printed is given right
+        # away, along with the other pending ones in creation order
+        self.assertEqual(c.name, '.7')
+        for value in (a, b, block, c, e, f):
+            self.assertIsNotNone(value._name)
+        self.assertEqual([a.name, b.name, block.name, e.name],
+                         ['.1', '.2', '.6', '.8'])
+        self.assertEqual(func.return_value.name, '.5')
+        self.assertEqual(f.name, 'f')
+        g = builder.add(f, f)
+        self.assertEqual(str(g), '%".9" = add i32 %"f", %"f"')
+        # Numbered names aren't stored but can't be reused
+        self.assertNotIn('.6', func.scope._useset)
+        self.assertTrue(func.scope.is_used('.6'))
+        self.assertEqual(builder.add(a, b, name='.6').name, '.6.1')
+        with self.assertRaises(ir._utils.DuplicatedNameError):
+            func.scope.register('.6')
+        # Module-level names are not deferred
+        mod = func.module
+        self.assertFalse(mod.scope.lazy)
+        self.assertEqual(ir.MetaDataString(mod, 'foo')._name, '.1')
+
+    def test_textual_order(self):
+        # Like LLVM's slot numbering, anonymous values are numbered in
+        # the order they appear in the function body
+        func = self.function()
+        entry = func.append_basic_block()
+        exit = func.append_basic_block()
+        builder = ir.IRBuilder(exit)
+        a, b = func.args[:2]
+        c = builder.add(a, b)
+        builder.ret(c)
+        builder.position_at_end(entry)
+        d = builder.mul(a, b)
+        builder.branch(exit)
+        builder.position_before(d)
+        e = builder.sub(a, b)
+        # (void instructions are numbered too)
+        self.check_func_body(func, """\
+            .5:
+              %".6" = sub i32 %".1", %".2"
+              %".7" = mul i32 %".1", %".2"
+              br label %".9"
+            .9:
+              %".10" = add i32 %".1", %".2"
+              ret i32 %".10"
+            """)
+        self.assertEqual([c.name, d.name, e.name], ['.10', '.7', '.6'])
+
+    def test_names_during_construction(self):
+        # Reading names while building a function doesn't walk the whole
+        # function each time
+        func = self.function()
+        builder = ir.IRBuilder(func.append_basic_block())
+        order = func.scope._order
+        walked = []
+
+        def walk():
+            for value in order():
+                walked.append(value)
+                yield value
+
+        func.scope._order = walk
+        a, b = func.args[:2]
+        n = 2000
+        for i in range(n):
+            a, b = b, builder.add(a, b)
+            # (after the arguments, the return value and the block)
+            self.assertEqual(b.name, '.%d' % (i + 7))
+        builder.ret(b)
+        self.assertEqual(walked, [])
+        text = str(func)
+        self.assertIn('ret i32 %%".%d"' % (n + 6), text)
+        # Printing numbers the remaining values in a single walk
+        self.assertEqual(len(walked), len(func.args) + 1 + n + 1)
+
+
+class TestContext(TestBase):
+
+    def test_child_context(self):
+        parent = ir.Context()
+        shared = parent.get_identified_type("Shared")
+        shared.set_body(int32)
+        child = parent.child()
+        self.assertIs(child.parent, parent)
+        self.assertIs(child.get_identified_type("Shared"), shared)
+        own = child.get_identified_type("Own")
+        own.set_body(shared)
+        self.assertNotIn("Own", parent.identified_types)
+        self.assertEqual(list(child.identified_types), ["Own"])
+        self.assertEqual(list(child.get_all_identified_types()),
+                         ["Shared", "Own"])
+        # Other children don't see the types of their siblings
+        self.assertIsNot(parent.child().get_identified_type("Own"), own)
+        mod = ir.Module(context=child)
+        ir.GlobalVariable(mod, own, 'gv')
+        self.assertIn('%"Shared" = type {i32}\n%"Own" = type {%"Shared"}',
+                      str(mod))
+
+    def test_scoped_context(self):
+        parent = ir.Context()
+        with parent.child() as ctx:
+            ty = ctx.get_identified_type("Temp")
+            self.assertIs(ctx.get_identified_type("Temp"), ty)
+        self.assertEqual(ctx.identified_types, {})
+        self.assertFalse(ctx.scope.is_used("Temp"))
+        self.assertIsNot(ctx.get_identified_type("Temp"), ty)
+        self.assertEqual(parent.identified_types, {})
+
+    def compile_in_child_context(self, parent, i):
+        with parent.child() as ctx:
+            sty = ctx.get_identified_type("Struct%d" % i)
+            sty.set_body(int32, ir.ArrayType(sty.as_pointer(), 4))
+            mod = ir.Module(context=ctx)
+            gv = ir.GlobalVariable(mod, sty, 'gv')
+            fn = self.function(mod)
+            builder = ir.IRBuilder(fn.append_basic_block())
+            builder.ret(builder.ptrtoint(builder.gep(gv, [int32(0)]),
+                                         int32))
+            str(mod)
+            return weakref.ref(sty)
+
+    def test_memory_growth(self):
+        # Types created in dropped child contexts don't accumulate
+        parent = ir.Context()
+        refs = [self.compile_in_child_context(parent, i) for i in range(50)]
+        gc.collect()
+        self.assertEqual([ref() for ref in refs], [None] * len(refs))
+        self.assertEqual(parent.identified_types, {})
+        ninterned = len(ir.types._interned_types)
+        for i in range(50, 100):
+            self.compile_in_child_context(parent, i)
+        gc.collect()
+        self.assertLessEqual(len(ir.types._interned_types), ninterned)
+
 
 class TestSingleton(TestBase):
     def test_undefined(self):